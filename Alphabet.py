@@ -0,0 +1,169 @@
+from typing import Iterable, Iterator
+from BDD import BDD
+
+class Alphabet:
+    """The alphabet of the propositional interpretations over a set of atomic
+    propositions.
+
+    Each letter (a subset of the propositions) is identified by an integer code,
+    which is the bitmask of the letter over the sorted propositions: the i-th bit
+    is set if the i-th proposition is true. Codes go from 0 to 2^n - 1, so the
+    iteration order of the alphabet does not depend on set hashing."""
+
+    # One shared alphabet for each set of propositions
+    _alphabets: dict[frozenset[str], "Alphabet"] = {}
+
+    def __init__(self, atomicProps: Iterable[str]) -> None:
+        self.props: tuple[str, ...] = tuple(sorted(atomicProps))
+        self.propIndex: dict[str, int] = {self.props[i]: i for i in range(len(self.props))}
+
+        self.size: int = 1 << len(self.props)
+
+        # Decoded letters, letters[code] is the set of true propositions
+        self.letters: list[frozenset[str]] = []
+        for code in range(self.size):
+            self.letters.append(frozenset(self.props[i] for i in range(len(self.props)) if (code >> i) & 1))
+
+    @classmethod
+    def of(cls, atomicProps: Iterable[str]) -> "Alphabet":
+        """Returns the alphabet shared by all the automata over the given propositions."""
+
+        key = frozenset(atomicProps)
+
+        alphabet = cls._alphabets.get(key)
+        if alphabet == None:
+            alphabet = Alphabet(key)
+            cls._alphabets[key] = alphabet
+
+        return alphabet
+
+    def encode(self, letter: Iterable[str]) -> int:
+        """Returns the code of a letter, the propositions not in the alphabet are ignored."""
+
+        code = 0
+        for p in letter:
+            i = self.propIndex.get(p)
+            if i != None:
+                code |= 1 << i
+
+        return code
+
+    def decode(self, code: int) -> frozenset[str]:
+        """Returns the set of propositions true in the letter with the given code."""
+
+        return self.letters[code]
+
+    def cubes(self, code: int) -> list[tuple[int, int]]:
+        """Returns the letter as a disjunction of cubes over the propositions, each cube
+        is a (mask, value) pair: the i-th proposition is fixed if the i-th bit of mask 
+        is set, and it is true if the i-th bit of value is set."""
+
+        return [(self.size - 1, code)]
+
+    def letterToStr(self, code: int) -> str:
+        return "{" + ", ".join(p for p in self.props if p in self.letters[code]) + "}"
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.size))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __str__(self) -> str:
+        return f"Alphabet({', '.join(self.props)})"
+
+class SymbolicAlphabet(Alphabet):
+    """An alphabet whose letters are the atoms of a partition of the propositional 
+    interpretations. Each atom is described by a guard stored as a BDD, whose 
+    variables are the sorted propositions, so the size of the alphabet depends 
+    on the number of atoms and not on the 2^n interpretations."""
+
+    def __init__(self, atomicProps: Iterable[str], bdd: BDD, guards: list[int]) -> None:
+        self.props: tuple[str, ...] = tuple(sorted(atomicProps))
+        self.propIndex: dict[str, int] = {self.props[i]: i for i in range(len(self.props))}
+
+        self.bdd = bdd
+
+        # guards[code] is the BDD of the atom with the given code
+        self.guards: list[int] = guards
+        self.size: int = len(guards)
+
+        # Atoms of the already encoded interpretations
+        self.atomOf: dict[int, int] = {}
+
+    @classmethod
+    def fromGuards(cls, atomicProps: Iterable[str], bdd: BDD, guards: Iterable[int]) -> "SymbolicAlphabet":
+        """Returns the alphabet of the coarsest partition of the interpretations 
+        such that each atom is either contained in or disjoint from every guard."""
+
+        atoms: list[int] = [BDD.TRUE]
+        seen: set[int] = set()
+
+        for g in guards:
+            if g in seen:
+                continue
+            seen.add(g)
+            
+            notG = bdd.neg(g)
+
+            newAtoms: list[int] = []
+            for a in atoms:
+                for part in (bdd.conj(a, g), bdd.conj(a, notG)):
+                    if part != BDD.FALSE:
+                        newAtoms.append(part)
+                        
+            atoms = newAtoms
+
+        # Atoms ordered by one of their interpretations, if there is no compression 
+        # the codes are the same of the explicit alphabet
+        atoms.sort(key=lambda a: bdd.pick(a))
+
+        return cls(atomicProps, bdd, atoms)
+
+    def interpretation(self, letter: Iterable[str]) -> int:
+        """Returns the bitmask over the sorted propositions of an interpretation."""
+
+        return Alphabet.encode(self, letter)
+
+    def encode(self, letter: Iterable[str]) -> int:
+        """Returns the code of the atom containing the interpretation."""
+
+        assignment = self.interpretation(letter)
+
+        code = self.atomOf.get(assignment)
+        if code == None:
+            for i in range(self.size):
+                if self.bdd.evaluate(self.guards[i], assignment):
+                    code = i
+                    break
+
+            assert code != None
+            self.atomOf[assignment] = code
+
+        return code
+
+    def decode(self, code: int) -> frozenset[str]:
+        """Returns an interpretation belonging to the atom."""
+
+        assignment = self.bdd.pick(self.guards[code])
+        assert assignment != None
+
+        return frozenset(self.props[i] for i in range(len(self.props)) if (assignment >> i) & 1)
+
+    def guard(self, code: int) -> int:
+        return self.guards[code]
+
+    def cubes(self, code: int) -> list[tuple[int, int]]:
+        return self.bdd.cubes(self.guards[code])
+
+    def letterToStr(self, code: int) -> str:
+        S = ""
+        for (mask, value) in self.cubes(code):
+            if len(S) > 0:
+                S += " | "
+            S += "{" + ", ".join(("" if (value >> i) & 1 else "~") + self.props[i] for i in range(len(self.props)) if (mask >> i) & 1) + "}"
+
+        return S
+
+    def __str__(self) -> str:
+        return f"SymbolicAlphabet({', '.join(self.props)}; {self.size} atoms)"
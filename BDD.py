@@ -0,0 +1,177 @@
+class BDD:
+    """Manager of reduced ordered binary decision diagrams over the variables 0, ..., n-1.
+
+    A node is identified by an integer, 0 and 1 are the terminal nodes FALSE
+    and TRUE. The nodes are stored in a unique table, so two equivalent
+    functions are always represented by the same node. An assignment of the
+    variables is given as a bitmask, the i-th bit is the value of the i-th variable."""
+
+    FALSE = 0
+    TRUE = 1
+
+    def __init__(self, varsNumber: int) -> None:
+        self.varsNumber = varsNumber
+
+        # The node u tests the variable var[u], low[u] and high[u] are the
+        # nodes reached when the variable is false or true respectively.
+        # The terminal nodes test the variable varsNumber.
+        self.var: list[int] = [varsNumber, varsNumber]
+        self.low: list[int] = [0, 1]
+        self.high: list[int] = [0, 1]
+
+        self.unique: dict[tuple[int, int, int], int] = {}
+
+        self.conjCache: dict[tuple[int, int], int] = {}
+        self.negCache: dict[int, int] = {}
+
+    def mk(self, var: int, low: int, high: int) -> int:
+        """Returns the node testing var with the given children."""
+
+        if low == high:
+            return low
+
+        key = (var, low, high)
+        u = self.unique.get(key)
+
+        if u == None:
+            u = len(self.var)
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = u
+
+        return u
+
+    def variable(self, i: int) -> int:
+        """Returns the node of the function true iff the i-th variable is true."""
+
+        return self.mk(i, BDD.FALSE, BDD.TRUE)
+
+    def neg(self, u: int) -> int:
+        if u <= BDD.TRUE:
+            return 1 - u
+
+        res = self.negCache.get(u)
+
+        if res == None:
+            res = self.mk(self.var[u], self.neg(self.low[u]), self.neg(self.high[u]))
+            self.negCache[u] = res
+
+        return res
+
+    def conj(self, u: int, v: int) -> int:
+        if u == BDD.FALSE or v == BDD.FALSE:
+            return BDD.FALSE
+        if u == BDD.TRUE or u == v:
+            return v
+        if v == BDD.TRUE:
+            return u
+
+        if u > v:
+            u, v = v, u
+
+        res = self.conjCache.get((u, v))
+
+        if res == None:
+            x = min(self.var[u], self.var[v])
+
+            u0, u1 = (self.low[u], self.high[u]) if self.var[u] == x else (u, u)
+            v0, v1 = (self.low[v], self.high[v]) if self.var[v] == x else (v, v)
+
+            res = self.mk(x, self.conj(u0, v0), self.conj(u1, v1))
+            self.conjCache[(u, v)] = res
+
+        return res
+
+    def disj(self, u: int, v: int) -> int:
+        return self.neg(self.conj(self.neg(u), self.neg(v)))
+
+    def cube(self, mask: int, value: int) -> int:
+        """Returns the node of the conjunction of the literals fixed by the cube,
+        the variables in mask must have the value given by the corresponding bit in value."""
+
+        u = BDD.TRUE
+
+        for i in reversed(range(self.varsNumber)):
+            if (mask >> i) & 1:
+                u = self.mk(i, BDD.FALSE, u) if (value >> i) & 1 else self.mk(i, u, BDD.FALSE)
+
+        return u
+
+    def evaluate(self, u: int, assignment: int) -> bool:
+        """Returns True if the assignment satisfies the function of the node."""
+
+        while u > BDD.TRUE:
+            u = self.high[u] if (assignment >> self.var[u]) & 1 else self.low[u]
+
+        return u == BDD.TRUE
+
+    def pick(self, u: int) -> int | None:
+        """Returns an assignment satisfying the node, None if there is no such assignment.
+        Variables that are not relevant are false."""
+
+        if u == BDD.FALSE:
+            return None
+
+        assignment = 0
+        while u > BDD.TRUE:
+            if self.low[u] != BDD.FALSE:
+                u = self.low[u]
+            else:
+                assignment |= 1 << self.var[u]
+                u = self.high[u]
+
+        return assignment
+
+    def cubes(self, u: int) -> list[tuple[int, int]]:
+        """Returns the node as a disjunction of disjoint cubes, given as (mask, value)
+        pairs, one for each path from the node to TRUE."""
+
+        res: list[tuple[int, int]] = []
+
+        S: list[tuple[int, int, int]] = [(u, 0, 0)]
+        while len(S) > 0:
+            (n, mask, value) = S.pop()
+
+            if n == BDD.TRUE:
+                res.append((mask, value))
+            elif n != BDD.FALSE:
+                bit = 1 << self.var[n]
+                S.append((self.high[n], mask | bit, value | bit))
+                S.append((self.low[n], mask | bit, value))
+
+        return res
+
+    def primeCubes(self, u: int) -> list[tuple[int, int]]:
+        """Returns the node as a disjunction of few cubes, given as (mask, value) pairs.
+        
+        As in the expand and irredundant steps of Espresso, each cube of cubes(u) is 
+        expanded to a prime implicant by removing its literals while it implies the node, 
+        then the cubes implied by the disjunction of the others are removed."""
+
+        notU = self.neg(u)
+
+        primes: list[tuple[int, int]] = []
+        for (mask, value) in self.cubes(u):
+            for i in range(self.varsNumber):
+                bit = 1 << i
+                if (mask & bit) and self.conj(self.cube(mask & ~bit, value & ~bit), notU) == BDD.FALSE:
+                    mask &= ~bit
+                    value &= ~bit
+
+            if not ((mask, value) in primes):
+                primes.append((mask, value))
+
+        i = 0
+        while i < len(primes):
+            others = BDD.FALSE
+            for j in range(len(primes)):
+                if j != i:
+                    others = self.disj(others, self.cube(primes[j][0], primes[j][1]))
+
+            if self.conj(self.cube(primes[i][0], primes[i][1]), self.neg(others)) == BDD.FALSE:
+                primes.pop(i)
+            else:
+                i += 1
+
+        return primes
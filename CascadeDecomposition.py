@@ -1,6 +1,10 @@
+from array import array
+from collections import deque
+from typing import Iterator
 from TSA import TSA, TSANode
-from FiniteAutomaton import FiniteAutomaton, State, Transition
-from itertools import combinations, chain
+from FiniteAutomaton import FiniteAutomaton, State, Transition, memoryReport
+from Alphabet import Alphabet, SymbolicAlphabet
+from BDD import BDD
 
 from pylogics.syntax.base import Logic, Not, And, Or
 from pylogics.syntax.pltl import Atomic as PltlAtomic, PropositionalTrue as PltlTrue, PropositionalFalse as PltlFalse
@@ -9,6 +13,8 @@ from pylogics.syntax.pltl import Formula as PLTLFormula, Before, Since, Once, Hi
 class CascadeState:
     """A state of a cascade automaton."""
     
+    __slots__ = ("index", "totalIndex", "tsaNode")
+    
     def __init__(self, index: int, tsaNode: TSANode) -> None:
         # The state index in the cascade automaton
         self.index = index
@@ -18,12 +24,17 @@ class CascadeState:
         self.tsaNode = tsaNode
         
 class CascadeAutomaton:
+    __slots__ = ("tsa", "parentCA", "atomicProps", "alphabet", "layer", "Q", "psi", "psiInv", 
+                 "configs", "configIndex", "configParent", "extensions", "table", "theta", "thetaInv", 
+                 "stateSum", "resets", "resetIns", "resetOuts")
+    
     def __init__(self, layer: int, parentCA: "CascadeAutomaton | None", tsa: TSA) -> None:
         """A semi-automaton representing a layer of a cascade decomposition."""
         
         self.tsa = tsa
         self.parentCA = parentCA
         self.atomicProps: set[str] = tsa.atomicProps
+        self.alphabet: Alphabet = tsa.alphabet
         
         # Layer number in the cascade decomposition
         self.layer = layer
@@ -42,12 +53,25 @@ class CascadeAutomaton:
         # Inverse of psi
         self.psiInv: dict[tuple[int, ...], TSANode] = {}  
         
+        # Configurations of the layer (the keys of psiInv) s.t. configs[c] is 
+        # the configuration with index c, and configIndex is its inverse
+        self.configs: list[tuple[int, ...]] = []
+        self.configIndex: dict[tuple[int, ...], int] = {}
+        
+        # configParent[c] is the index of configs[c] without its last state in 
+        # the parent layer (0 in the root layer), and extensions[p * |Q| + q] is 
+        # the index of the configuration made of the p-th configuration of the 
+        # parent layer and of the state q (-1 if there is no such configuration)
+        self.configParent: array = array('i')
+        self.extensions: array = array('i')
+        
         # Transition function of the Cascade Automaton s.t.
-        #   delta[(q, config, propositionalInterpretation)] => target
-        # where q is the index of the starting cascade state, config is 
-        # a configuration in the parent layer and propositionalInterpretation is
-        # a word of the alphabet
-        self.delta: dict[tuple[int, tuple[int, ...], tuple[str, ...]], CascadeState] = {}
+        #   table[c * |alphabet| + s] => target
+        # where c is the index of the configuration made of a configuration in 
+        # the parent layer and of the starting cascade state, s is the code of a 
+        # letter of the alphabet and target is the index of the target state 
+        # (-1 if there is no transition)
+        self.table: array = array('i')
         
         # Mapping beetween TSA nodes and their representatives in the 
         # decomposition s.t.
@@ -59,6 +83,13 @@ class CascadeAutomaton:
         
         # Inverse of theta
         self.thetaInv: dict[int, list[TSANode]] = {}
+        
+        # Reset letters of the layer and, for each state, the reset letters entering 
+        # and exiting it. They are computed by computeResetIndex the first time 
+        # they are needed, and must be set to None if the table is modified
+        self.resets: set[tuple[tuple[int, ...], int]] | None = None
+        self.resetIns: list[list[tuple[tuple[int, ...], int]]] | None = None
+        self.resetOuts: list[list[tuple[tuple[int, ...], int]]] | None = None
 
         # The automaton is computed starting from the
         # corresponding layer in the TSA
@@ -79,18 +110,20 @@ class CascadeAutomaton:
             self.psi[m.index] = (root.index, )
             self.psiInv[(root.index,)] = m
             
-            alphabet_it = chain.from_iterable(combinations(tsa.atomicProps, r) for r in range(len(tsa.atomicProps)+1))
+            self.computeConfigurations()
             
-            for s in alphabet_it:
-                coord: tuple[int, tuple[int, ...], tuple[str, ...]] = (root.index, tuple(), s) 
-                
-                self.delta[coord] = root
+            for s in self.alphabet:
+                self.table[s] = root.index
                 
         else:
+            # Nodes of the parent layer already visited by assignTheta, they are kept
+            # here so that the TSA is never modified and can be shared
+            visited: set[int] = set()
+            
             for m in tsa.heightClasses[layer - 1]:
                 if not (m.equivClass in self.theta):
                     self.theta[m.equivClass] = {}
-                    m._CAvisited = True
+                    visited.add(m.index)
                     
                     # For each equivalence class in the parent layer choose 
                     # a node, then select its children as representatives in 
@@ -103,7 +136,7 @@ class CascadeAutomaton:
                     # Assign a representative in the decomposition to 
                     # all the children of the other nodes in the equivalence 
                     # class at the parent layers
-                    self.assignTheta(m, m, self.theta[m.equivClass], [])
+                    self.assignTheta(m, m, self.theta[m.equivClass], visited)
                 
             for q in self.Q:
                 self.thetaInv[q.index] = []
@@ -133,20 +166,23 @@ class CascadeAutomaton:
                 config = self.psi[m]
                 self.psiInv[config] = self.tsa.nodes[m]
 
-            alphabet_it = chain.from_iterable(combinations(tsa.atomicProps, r) for r in range(len(tsa.atomicProps)+1))
+            self.computeConfigurations()
+            size = len(self.alphabet)
 
             # Add transition in the automaton
-            for s in alphabet_it:
-                for config in self.psiInv:
+            for s in self.alphabet:
+                for c in range(len(self.configs)):
+                    config = self.configs[c]
+                    
                     # Find the corresponding target in the TSA
-                    targetNode = self.psiInv[config].computeTransition(set(s))
+                    targetNode = self.psiInv[config].computeTransition(s)
 
                     assert targetNode.parent != None, print("Target:", targetNode.states, ", layer:" ,layer,  ", config: ", config, ", psi:", self.psiInv)
                     
                     # If the target node in the TSA exists get its representative
                     targetState = self.theta[targetNode.parent.equivClass][targetNode.index]
                     
-                    self.delta[(config[-1:][0], config[:-1], s)] = targetState
+                    self.table[c * size + s] = targetState.index
 
         # Compute the total indexes, which are the indexes of the cascade states
         # relative to the entire cascade decomposition
@@ -157,52 +193,93 @@ class CascadeAutomaton:
             
         self.stateSum += len(self.Q)
         
-    def assignTheta(self, m: TSANode, reprParent: TSANode, theta_i: dict[int, CascadeState], word: list[set[str]]) -> None:
+    def assignTheta(self, m: TSANode, reprParent: TSANode, theta_i: dict[int, CascadeState], visited: set[int]) -> None:
         """Given a TSA node assigns the representative to each children of the nodes in the
         same equivalence class."""
         
-        # Visit the equivalence class in the parent layer
-        for t in m.trans:
-            if not t.target._CAvisited and t.target.equivClass == reprParent.equivClass:
-                t.target._CAvisited = True
+        # Depth first visit of the equivalence class in the parent layer, 
+        # with an iterator over the transitions of each node
+        S: list[Iterator[TSANode]] = [iter(m.targets.values())]
+        
+        while len(S) > 0:
+            target = next(S[-1], None)
+            
+            if target == None:
+                S.pop()
+                continue
+            
+            if not (target.index in visited) and target.equivClass == reprParent.equivClass:
+                visited.add(target.index)
                 
-                newWord: list[set[str]] = word.copy()
-                newWord.append(t.ap)
+                # Compute the equivalence word from the target to the parent 
+                # of the representative
+                equivalenceWord = self.tsa.equivalenceWord(target, reprParent)
+                assert equivalenceWord != None
                 
-                for c in t.target.children:
+                for c in target.children:
                     r = self.tsa.nodes[c]
                     
-                    # Compute the equivalence word from the target to the parent 
-                    # of the representative
-                    equivalenceWord = self.tsa.computeWordTo(t.target, reprParent, [False for _ in range(len(self.tsa.nodes))], [])
-                    assert equivalenceWord != None
-                    
                     # Follow the equivalence word in the current layer
                     # to determine the representative
                     representative = r.computeWord(r, equivalenceWord)
                     
                     theta_i[c] = theta_i[representative.index]
                 
-                self.assignTheta(t.target, reprParent, theta_i, newWord)
+                S.append(iter(target.targets.values()))
 
+    def computeConfigurations(self) -> None:
+        """Numbers the configurations of the layer (the keys of psiInv) and allocates 
+        the transition table."""
+        
+        self.configs = list(self.psiInv.keys())
+        self.configIndex = {self.configs[c]: c for c in range(len(self.configs))}
+        
+        parentIndex = self.parentCA.configIndex if self.parentCA != None else {(): 0}
+        
+        self.configParent = array('i', [parentIndex[config[:-1]] for config in self.configs])
+        
+        self.extensions = array('i', [-1]) * (len(parentIndex) * len(self.Q))
+        for c in range(len(self.configs)):
+            self.extensions[self.configParent[c] * len(self.Q) + self.configs[c][-1]] = c
+            
+        self.table = array('i', [-1]) * (len(self.configs) * len(self.alphabet))
+        
+    def transitions(self) -> Iterator[tuple[tuple[int, tuple[int, ...], int], CascadeState]]:
+        """Yields the transitions of the automaton as ((q, config, s), target) pairs, where
+        q is the starting state, config is a configuration in the parent layer and s is 
+        the code of a letter, ordered by letter and then by configuration."""
+        
+        size = len(self.alphabet)
+        
+        for s in self.alphabet:
+            for c in range(len(self.configs)):
+                target = self.table[c * size + s]
+                
+                if target >= 0:
+                    config = self.configs[c]
+                    yield ((config[-1], config[:-1], s), self.Q[target])
+    
     def addState(self, tsaNode: TSANode) -> CascadeState:
         newState = CascadeState(len(self.Q), tsaNode)
         self.Q.append(newState)           
                      
         return newState
     
-    def getResetsLetters(self) -> set[tuple[tuple[int, ...], tuple[str, ...]]]:
-        resets: set[tuple[tuple[int, ...], tuple[str, ...]]] = set()
+    def computeResets(self) -> set[tuple[tuple[int, ...], int]]:
+        """Returns the letters (pairs of a configuration of the parent layer and 
+        a letter of the alphabet) which send all the states to the same state."""
         
-        T: dict[tuple[tuple[int, ...], tuple[str, ...]], list[CascadeState]] = {}
+        resets: set[tuple[tuple[int, ...], int]] = set()
         
-        for t in self.delta:
+        T: dict[tuple[tuple[int, ...], int], list[CascadeState]] = {}
+        
+        for (t, target) in self.transitions():
             letter = (t[1], t[2])
             if letter in T:
-                T[letter].append(self.delta[t])  
+                T[letter].append(target)  
             else:
                 T[letter] = []         
-                T[letter].append(self.delta[t])           
+                T[letter].append(target)           
     
         for letter in T:
             isReset = True
@@ -219,46 +296,86 @@ class CascadeAutomaton:
         return resets
     
     def isInit(self, realtiveIndex: int, initStateIndex: int) -> bool:
-        return initStateIndex in self.Q[realtiveIndex].tsaNode.states
+        return self.Q[realtiveIndex].tsaNode.containsState(initStateIndex)
     
-    def computeStateIns(self, state: int) -> list[tuple[tuple[int, ...], set[str]]]:
+    def computeResetIndex(self) -> None:
+        """Computes the reset letters and, with a single pass over the transitions, the 
+        reset letters entering and exiting each state (in the order of transitions)."""
+        
+        self.resets = self.computeResets()
+        self.resetIns = [[] for _ in self.Q]
+        self.resetOuts = [[] for _ in self.Q]
+        
+        # A reset letter has a single target, so it enters only one state
+        entering: set[tuple[tuple[int, ...], int]] = set()
+        
+        for (k, target) in self.transitions():
+            letter = (k[1], k[2])
+            
+            if k[0] != target.index and letter in self.resets:
+                if not (letter in entering):
+                    entering.add(letter)
+                    self.resetIns[target.index].append(letter)
+                    
+                # Each state has a single transition with each letter
+                self.resetOuts[k[0]].append(letter)
+    
+    def computeStateIns(self, state: int) -> list[tuple[tuple[int, ...], int]]:
         """Returns all the transitions entering the state"""
         
-        ins: list[tuple[tuple[int, ...], set[str]]] = [] 
-        for k in self.delta.keys():
-            if self.delta[k].index == state and ((k[1], k[2]) in self.getResetsLetters()) and k[0] != state and not ( (k[1], set(k[2])) in ins):
-                ins.append((k[1], set(k[2])))
-        return ins
+        if self.resetIns == None:
+            self.computeResetIndex()
+            
+        assert self.resetIns != None
+        
+        return self.resetIns[state]
     
-    def computeStateOuts(self, state: int) -> list[tuple[tuple[int, ...], set[str]]]:
+    def computeStateOuts(self, state: int) -> list[tuple[tuple[int, ...], int]]:
         """Returns all the transitions exiting the state."""
         
-        outs: list[tuple[tuple[int, ...], set[str]]] = [] 
-        for k in self.delta.keys():
-            if k[0] == state and ((k[1], k[2]) in self.getResetsLetters()) and self.delta[k] != self.Q[k[0]]  and not ( (k[1], set(k[2])) in outs):
-                outs.append((k[1], set(k[2])))    
-        return outs
+        if self.resetOuts == None:
+            self.computeResetIndex()
+            
+        assert self.resetOuts != None
+        
+        return self.resetOuts[state]
 
-    def propIntToStr(self, propositionalInterpretation: set[str]) -> str:
-        """Transforms a propositional interpretation over the alphabet in a string."""
+    def propIntToStr(self, letter: int) -> str:
+        """Transforms a letter of the alphabet in a string."""
         
         S = ""
-        for p in self.atomicProps:
+        for (mask, value) in self.alphabet.cubes(letter):
             if len(S) > 0:
-                S += " && "
-            if p in propositionalInterpretation:
-                S += f"{p}"
-            else:
-                S += f"~{p}"
+                S += " || "
+                
+            C = ""
+            for i in range(len(self.alphabet.props)):
+                if not ((mask >> i) & 1):
+                    continue
+                if len(C) > 0:
+                    C += " && "
+                if (value >> i) & 1:
+                    C += f"{self.alphabet.props[i]}"
+                else:
+                    C += f"~{self.alphabet.props[i]}"
+                    
+            S += C if len(C) > 0 else "true"
         
         return S     
 
     def configToStr(self, config: tuple[int, ...], layerCa: "CascadeAutomaton | None") -> str:
         """Returns a configuration as a string."""
         
-        if layerCa == None: return ""
-        else:
-            return self.configToStr(config[:-1], layerCa.parentCA) + "," + chr(ord("A") + layerCa.Q[config[len(config) - 1]].totalIndex)
+        # The last state of the configuration belongs to layerCa, 
+        # the previous ones to its ancestors
+        S = ""
+        i = len(config) - 1
+        while layerCa != None:
+            S = "," + chr(ord("A") + layerCa.Q[config[i]].totalIndex) + S
+            layerCa = layerCa.parentCA
+            i -= 1
+            
+        return S
                                 
     def toDot(self) -> str:
         """Returns a string in dot format of the automaton."""
@@ -284,8 +401,8 @@ class CascadeAutomaton:
             
             S += f"\n\t{q.totalIndex} [label=\"{letter} {q.tsaNode.states}\"]"
             
-        for k in self.delta.keys():
-            S += f"\n\t{self.Q[k[0]].totalIndex} -> {self.delta[k].totalIndex} [label=\"[{self.configToStr(k[1], self.parentCA)}] {self.propIntToStr(set(k[2]))}\"];"
+        for (k, target) in self.transitions():
+            S += f"\n\t{self.Q[k[0]].totalIndex} -> {target.totalIndex} [label=\"[{self.configToStr(k[1], self.parentCA)}] {self.propIntToStr(k[2])}\"];"
     
         S += "\n}\n"
         return S
@@ -299,14 +416,17 @@ class CascadeAutomaton:
         src.render(imagePath + imageName, format = "svg", view = False)
         
 class CascadeDecomposition:
-    def __init__(self, dfa: FiniteAutomaton):
-        """Build the cascade decomposition of a FiniteAutomaton"""
+    def __init__(self, dfa: FiniteAutomaton, tsa: TSA | None = None):
+        """Build the cascade decomposition of a FiniteAutomaton. 
+        
+        The TSA of the automaton can be given, the decomposition does not modify 
+        it, so the same TSA can be shared by many decompositions (also built by 
+        different threads). Nothing is rendered, see visualize and visualizeWithTsa."""
         
         self.dfa = dfa
         
         # Holonomy three associated to the automaton
-        self.tsa = TSA(dfa)
-        self.tsa.visualize(True, "TSA_in_CD", "imgs/trn/")
+        self.tsa = tsa if tsa != None else TSA(dfa)
         
         self.dfaStatesNumber = dfa.statesNumber
         self.dfaAcceptingStates = dfa.acceptingStates
@@ -323,17 +443,31 @@ class CascadeDecomposition:
         for CA in self.CAs:
             for q in CA.Q:
                 self.stateToCa[q.totalIndex] = CA
-    
-        self.visualizeWithTsa("withTSA", "imgs/trn/")
         
         self.phiInv = self.computePhiInv()
         self.phi: dict[tuple[int, ...], State] = self.computePhi()
+        
+        # Formulas already built by the synthesis, so that each subformula is built 
+        # once and shared: the formulas of the cascade states (by total index), of the 
+        # configurations, of the groups of reset letters with the same configuration 
+        # and of the sets of letters of the alphabet
+        self.stateFormulas: dict[int, PLTLFormula] = {}
+        self.configurationFormulas: dict[tuple[int, ...], PLTLFormula] = {}
+        self.resetFormulas: dict[tuple[tuple[int, ...], tuple[int, ...]], PLTLFormula] = {}
+        self.letterFormulas: dict[tuple[int, ...], PLTLFormula] = {}
+        
+        # Manager of the BDDs of the sets of letters of an explicit alphabet
+        self.lettersBdd: BDD | None = None
             
     def synthetizeFormula(self) -> PLTLFormula:
         """Returns the PLTLf formula associated to the input DFA.
         
         The formula is the conjuction of the 
         formulas associated to the accepting states.
+        
+        Each subformula is built once and the repeated ones are the same 
+        object, so the formula is a DAG which does not grow exponentially 
+        with the number of layers (printing it still expands it to a tree).
         """
         
         res: PLTLFormula | None = None
@@ -374,24 +508,27 @@ class CascadeDecomposition:
         """Returns the PLTLf formula associated to a configuration.
         
         The formula is built as the disjunction of the formulas 
-        associated to each state in the configuration.
+        associated to each state in the configuration. It is the 
+        conjunction of the formula of the configuration without its 
+        last state and of the formula of the last state, so the 
+        configurations with the same prefix share it.
         """
-        res: PLTLFormula | None = None
         
+        assert len(config) > 0, print("Configuration is empty!")
         
-        for i in range(len(config)):
-            q = config[i]
-            
-            f: PLTLFormula = self.CAStateFormula(self.CAs[i].Q[q].totalIndex, q)
-            
-            if res == None:
-                res = f
-            else:
-                res = And(res, f)
-                
-        # print("Config:", config, ", formula:", res)
+        res = self.configurationFormulas.get(config)
+        if res != None:
+            return res
+        
+        q = config[-1]
+        f: PLTLFormula = self.CAStateFormula(self.CAs[len(config) - 1].Q[q].totalIndex, q)
+        
+        if len(config) == 1:
+            res = f
+        else:
+            res = And(self.configurationFormula(config[:-1]), f)
                 
-        assert res != None, print("Configuration is empty!")
+        self.configurationFormulas[config] = res
         
         return res
         
@@ -406,6 +543,10 @@ class CascadeDecomposition:
         if totalIndex == 0:
             return PltlTrue()
         
+        res = self.stateFormulas.get(totalIndex)
+        if res != None:
+            return res
+        
         CA = self.stateToCa[totalIndex]
         
         # Set of transition entering the automaton
@@ -416,66 +557,134 @@ class CascadeDecomposition:
         
         inFromula: PLTLFormula = PltlFalse()
         
-        for c in ins:
-            f: PLTLFormula
-            if totalIndex == 0:
-                f = self.propIntToFormula(c[1])
-            else:
-                # For all the states not in the root layer the letter of a transition consists
-                # in a configuration and an interpretation for each proposition, which are 
-                # decomposed in the following way
-                
-                nextStateRelIdx = c[0][len(c[0]) - 1]
-                
-                if CA.parentCA.isInit(nextStateRelIdx, self.dfa.initState.index):
-                    f = And(self.propIntToFormula(c[1]), WeakBefore(self.configurationFormula(c[0])))
-                else:
-                    f = And(self.propIntToFormula(c[1]), Before(self.configurationFormula(c[0])))
-                
-            inFromula = Or(inFromula, f)  
+        for (config, letters) in self.groupResetLetters(ins):
+            inFromula = Or(inFromula, self.resetLettersFormula(CA, config, letters))  
             
         outFromula: PLTLFormula = PltlFalse()
         
-        for c in outs:
-            f: PLTLFormula
-            if totalIndex == 0:
-                f = self.propIntToFormula(c[1])
+        for (config, letters) in self.groupResetLetters(outs):
+            outFromula = Or(outFromula, self.resetLettersFormula(CA, config, letters))
+        
+        if CA.Q[CAindex].tsaNode.containsState(self.dfa.initState.index):
+            res = Or(Since(Not(outFromula), inFromula), Not(Since(PltlTrue(), (outFromula)))) 
+        else:
+            res = Since(Not(outFromula), inFromula)
+            
+        self.stateFormulas[totalIndex] = res
+        
+        return res
+    
+    def groupResetLetters(self, resets: list[tuple[tuple[int, ...], int]]) -> list[tuple[tuple[int, ...], tuple[int, ...]]]:
+        """Groups the reset letters by configuration, in order of first occurrence. 
+        Each group is a configuration and the letters of the alphabet with it."""
+        
+        groups: dict[tuple[int, ...], list[int]] = {}
+        for (config, s) in resets:
+            if config in groups:
+                groups[config].append(s)
             else:
-                # For all the states not in the root layer the letter of a transition consists
-                # in a configuration and an interpretation for each proposition, which are 
-                # decomposed in the following way
+                groups[config] = [s]
                 
-                nextStateRelIdx = c[0][len(c[0]) - 1]
-                
-                if CA.parentCA.isInit(nextStateRelIdx, self.dfa.initState.index):
-                    f = And(self.propIntToFormula(c[1]), WeakBefore(self.configurationFormula(c[0])))
-                else:
-                    f = And(self.propIntToFormula(c[1]), Before(self.configurationFormula(c[0])))
-                
-            outFromula = Or(outFromula, f)
+        return [(config, tuple(sorted(letters))) for (config, letters) in groups.items()]
+    
+    def resetLettersFormula(self, CA: CascadeAutomaton, config: tuple[int, ...], letters: tuple[int, ...]) -> PLTLFormula:
+        """Returns the PLTLf formula of the reset letters of a layer which is not the root 
+        one with the same configuration.
+        
+        For all the states not in the root layer the letter of a transition consists
+        in a configuration and an interpretation for each proposition, the formula 
+        is the conjunction of the minimized disjunction of the interpretations and 
+        of the configuration at the previous instant."""
+        
+        # The configuration determines the layer
+        key = (config, letters)
         
-        if self.dfa.initState.index in CA.Q[CAindex].tsaNode.states:
-            return Or(Since(Not(outFromula), inFromula), Not(Since(PltlTrue(), (outFromula)))) 
+        res = self.resetFormulas.get(key)
+        if res != None:
+            return res
         
-        return Since(Not(outFromula), inFromula)
+        assert CA.parentCA != None
+        
+        nextStateRelIdx = config[len(config) - 1]
+        
+        if CA.parentCA.isInit(nextStateRelIdx, self.dfa.initState.index):
+            res = WeakBefore(self.configurationFormula(config))
+        else:
+            res = Before(self.configurationFormula(config))
+            
+        lettersFormula = self.lettersToFormula(letters)
+        if not isinstance(lettersFormula, PltlTrue):
+            res = And(lettersFormula, res)
+            
+        self.resetFormulas[key] = res
+        
+        return res
+    
+    def lettersToFormula(self, letters: tuple[int, ...]) -> PLTLFormula:
+        """Converts a set of letters of the alphabet (sorted) to a PLTLf formula.
+        
+        The formula is a disjunction of cubes equivalent to the disjunction of the 
+        letters, it is minimized with BDD.primeCubes, so for example all the letters 
+        of two propositions where the first one is true become the single literal."""
+        
+        res = self.letterFormulas.get(letters)
+        if res != None:
+            return res
+        
+        alphabet = self.tsa.alphabet
+        
+        # The disjunction of the letters as a BDD over the sorted propositions
+        if isinstance(alphabet, SymbolicAlphabet):
+            bdd = alphabet.bdd
+            guard = BDD.FALSE
+            for s in letters:
+                guard = bdd.disj(guard, alphabet.guard(s))
+        else:
+            if self.lettersBdd == None:
+                self.lettersBdd = BDD(len(alphabet.props))
+            bdd = self.lettersBdd
+            
+            guard = BDD.FALSE
+            for s in letters:
+                guard = bdd.disj(guard, bdd.cube((1 << len(alphabet.props)) - 1, s))
+        
+        for (mask, value) in bdd.primeCubes(guard):
+            f: PLTLFormula = self.cubeToFormula(mask, value)
+            
+            if res == None:
+                res = f
+            else:
+                res = Or(res, f)
+                        
+        assert res != None, print("The letter is empty!")
+        
+        self.letterFormulas[letters] = res
+        
+        return res
     
-    def propIntToFormula(self, propInt: set[str]) -> PLTLFormula:
-        """Converts a propositional interpretation to a PLTLf formula."""
+    def cubeToFormula(self, mask: int, value: int) -> PLTLFormula:
+        """Converts a cube over the atomic propositions to a conjunction of literals."""
         res: PLTLFormula | None = None
         
-        for s in self.tsa.atomicProps:
+        props = self.tsa.alphabet.props
+        
+        for i in range(len(props)):
+            if not ((mask >> i) & 1):
+                continue
+            
             f: PLTLFormula
-            if s in propInt:
-                f = PltlAtomic(s)
+            if (value >> i) & 1:
+                f = PltlAtomic(props[i])
             else:
-                f = Not(PltlAtomic(s))
+                f = Not(PltlAtomic(props[i]))
             
             if res == None:
                 res = f
             else:
                 res = And(res, f)
-                        
-        assert res != None, print("There is not an atomic proposition!")
+                
+        if res == None:
+            return PltlTrue()
         
         return res
         
@@ -545,41 +754,54 @@ class CascadeDecomposition:
     def homomorphicAutomaton(self) -> FiniteAutomaton:
         """Builds the automaton homomorphic to the decomposition.
         
-        This construction does not correctly assign the inital 
-        and accepting states.
+        The states are the configurations reachable from the configurations 
+        of the initial state of the DFA, in breadth first order, so the 
+        initial state is the first one. This construction does not 
+        correctly assign the accepting states.
         """
         
-        configs = self.computeLastLayerConfigurations(0, [()])
-        lastCa = self.CAs[len(self.CAs) - 1]
+        layer = len(self.CAs) - 1
+        lastCa = self.CAs[layer]
         
-        for config in configs:
-            if not (config in lastCa.psiInv.keys()):
-                configs.remove(config)
-               
-        # Initiate the homomorphic automaton
-        fa = FiniteAutomaton(len(configs), self.tsa.atomicProps)
+        # Indexes of the reachable configurations of the last layer in order 
+        # of discovery, stateOf[c] is the state of the c-th configuration 
+        configs: list[int] = []
+        stateOf: list[int] = [-1] * len(lastCa.configs)
         
-        # Declaration of the homomorphism function
-        phi: dict[tuple[int, ...], State] = {}
+        for config in self.phiInv[self.dfaInitState.index]:
+            c = lastCa.configIndex[config]
+            if stateOf[c] < 0:
+                stateOf[c] = len(configs)
+                configs.append(c)
+                
+        assert len(configs) > 0, print("The initial state has no configuration")
         
-        # Assignment of each configuration to a state in the
-        # newly created automaton
-        index = 0
-        for config in configs:
-            phi[config] = fa.states[index]
-            index += 1
+        # Transitions between the indexes of the configurations
+        transitions: list[tuple[int, int, int]] = []
         
-        # Generation of the transition function in the automaton
-        for k in lastCa.delta.keys():
-            startConfig: tuple[int, ...] = k[1] + (k[0], )
+        Q: deque[int] = deque(configs)
+        while len(Q) > 0:
+            c = Q.popleft()
             
-            targetConfig: tuple[int, ...] | None = self.computeConfigurationTransition(len(self.CAs) - 1, startConfig, k[2])
-
-            # If the transition from startConfig with letter k[2] 
-            # exists, adda a transition between the corresponding
-            # states in the automaton
-            if targetConfig != None:
-                fa.addTransition(phi[startConfig], phi[targetConfig], set(k[2]))
+            for s in self.tsa.alphabet:
+                t = self.configurationTransitionIndex(layer, c, s)
+                
+                # If the transition from the configuration with letter s 
+                # exists, add a transition between the corresponding
+                # states in the automaton
+                if t >= 0:
+                    if stateOf[t] < 0:
+                        stateOf[t] = len(configs)
+                        configs.append(t)
+                        Q.append(t)
+                        
+                    transitions.append((c, t, s))
+               
+        # Initiate the homomorphic automaton
+        fa = FiniteAutomaton(len(configs), alphabet=self.tsa.alphabet)
+        
+        for (c, t, s) in transitions:
+            fa.addTransition(fa.states[stateOf[c]], fa.states[stateOf[t]], s)
         
         return fa
     
@@ -591,18 +813,24 @@ class CascadeDecomposition:
         """
         
         # Initialization of the homomorphic automaton
-        FA = FiniteAutomaton(len(self.phi.keys()), self.dfa.atomicProps)
+        FA = FiniteAutomaton(len(self.phi.keys()), alphabet=self.dfa.alphabet)
         
-        alphabet_it = chain.from_iterable(combinations(self.dfa.atomicProps, r) for r in range(len(self.dfa.atomicProps)+1))
-            
-        for s in alphabet_it:
+        layer = len(self.CAs) - 1
+        lastCa = self.CAs[layer]
+        
+        # phiIndex[c] is the index of the state of the c-th configuration of the last layer
+        phiIndex: list[int] = [-1] * len(lastCa.configs)
+        for config in self.phi:
+            phiIndex[lastCa.configIndex[config]] = self.phi[config].index
+        
+        for s in self.dfa.alphabet:
             for config in self.phi.keys():
-                targetConfig = self.computeConfigurationTransition(len(config) - 1, config, s)
+                t = self.configurationTransitionIndex(layer, lastCa.configIndex[config], s)
                 
-                if targetConfig != None:
+                if t >= 0 and phiIndex[t] >= 0:
                     startState = FA.states[self.phi[config].index]
-                    targetState = FA.states[self.phi[targetConfig].index]
-                    FA.addTransition(startState, targetState, set(s))
+                    targetState = FA.states[phiIndex[t]]
+                    FA.addTransition(startState, targetState, s)
                     
         for accState in self.dfaAcceptingStates:
             FA.acceptingStates.append(FA.states[accState.index])
@@ -611,42 +839,75 @@ class CascadeDecomposition:
     
         return FA
     
-    def computeLastLayerConfigurations(self, layer: int, config: list[tuple[int, ...]]) -> list[tuple[int, ...]]:
-        """Returns all the possible configurations, including the empty ones."""
-        
-        newConfig = []
-        for i in range(len(config)):
-            for state in self.CAs[layer].Q:
-                newConfig.append(config[i] + (state.index, ))
-        
-        if layer == len(self.CAs) - 1:
-            return newConfig
-        else:
-            return self.computeLastLayerConfigurations(layer + 1, newConfig)
-        
-    def computeConfigurationTransition(self, layer: int, config: tuple[int, ...], s: tuple[str, ...]) -> tuple[int, ...] | None:
+    def computeConfigurationTransition(self, layer: int, config: tuple[int, ...], s: int) -> tuple[int, ...] | None:
         """Returns the target state of a transition in the configuration tree. If there 
         is no such transition, None is returned instead."""
         
         assert layer < len(self.CAs)
         
+        CA = self.CAs[layer]
+        
+        c = CA.configIndex.get(config)
+        if c != None:
+            t = self.configurationTransitionIndex(layer, c, s)
+            
+            if t >= 0:
+                return CA.configs[t]
+        
+        # The configuration or its target is not a configuration of the layer 
         targetConfig: tuple[int, ...] = ()
         
         for i in range(layer + 1):
             # Compute the transition in each layer for the letter
             # given by the i-th subconfiguration of the starting configuration
             # and the given propositional interpretation
-            layerTargetState: CascadeState | None = self.CAs[i].delta[(config[i], config[:i], s)]
+            layerCA = self.CAs[i]
+            layerTargetState = layerCA.table[layerCA.configIndex[config[:i + 1]] * len(self.dfa.alphabet) + s]
             
-            if (layerTargetState == None): 
+            if (layerTargetState < 0): 
                 return None
             else:
                 # If there is a target for the transition in the current layer
                 # add it to the target configuration
-                targetConfig += (layerTargetState.index, )
+                targetConfig += (layerTargetState, )
 
         return targetConfig
+    
+    def configurationTransitionIndex(self, layer: int, c: int, s: int) -> int:
+        """Returns the index of the target of the c-th configuration of a layer with the 
+        letter s, -1 if there is no transition or if the target is not a configuration 
+        of the layer."""
+        
+        size = len(self.dfa.alphabet)
+        
+        # Indexes of the prefixes of the configuration in the lower layers
+        prefixes = [0] * (layer + 1)
+        for i in range(layer, -1, -1):
+            prefixes[i] = c
+            c = self.CAs[i].configParent[c]
+            
+        # Index of the prefix of the target in the previous layer
+        t = 0
+        for i in range(layer + 1):
+            CA = self.CAs[i]
+            
+            q = CA.table[prefixes[i] * size + s]
+            if q < 0:
+                return -1
+            
+            t = CA.extensions[t * len(CA.Q) + q]
+            if t < 0:
+                return -1
+            
+        return t
 
+    def memoryReport(self, seen: set[int] | None = None) -> dict[str, int]:
+        """Returns the bytes used by each component of the decomposition and their total
+        in "total". The DFA and the TSA are given the total of their own reports, the 
+        cascade automata ("CAs") are counted without the TSA nodes."""
+        
+        return memoryReport(self, seen)
+        
     def toDot(self) -> str:
         """Returns a string containing the decomposition in Dot format."""
         
@@ -707,8 +968,8 @@ class CascadeDecomposition:
             S += f"\n\t{n.index + offset} [label=\"{n.states} {n.equivClass}\", color=\"green\"]"
             # S += f"\n\t{n.index + offset} [label=\"{n.states}\", color=\"green\" ]"
             
-            for t in n.trans:
-                S += f"\n\t{n.index + offset} -> {t.target.index + offset} [label=\"{t.ap}\"];"
+            for (s, target) in n.transitions():
+                S += f"\n\t{n.index + offset} -> {target.index + offset} [label=\"{self.tsa.alphabet.letterToStr(s)}\"];"
     
         for idx in range(1, len(self.tsa.nodes)):
             n = self.tsa.nodes[idx]
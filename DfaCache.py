@@ -0,0 +1,160 @@
+import hashlib
+import os
+import tempfile
+import time
+
+class DfaCache:
+    """Persistent cache of the automata of the LTLf formulas, so that MONA is run
+    only once for each formula.
+
+    Each automaton is stored in its binary form (FiniteAutomaton.toBytes) in a file
+    named by the hash of the normalized formula and of the versions of ltlf2dfa, of
+    MONA and of the binary format, so entries written by different versions are never mixed.
+    Files are written to a temporary file and then renamed, so concurrent processes
+    never read a partial entry. When the total size exceeds maxBytes the least recently used
+    entries are removed, the use time of an entry is its modification time.
+
+    The formula constructor of FiniteAutomaton uses the cache only when it is enabled
+    by setting PPLTLF_CACHE=1 (see default)."""
+
+    # Temporary files older than this (in seconds) are left over by dead processes
+    STALE_TIME = 3600
+
+    _default: "DfaCache | None" = None
+
+    # Version of MONA, read once per process by monaVersion
+    _monaVersion: str | None = None
+
+    def __init__(self, directory: str | None = None, maxBytes: int | None = None) -> None:
+        if directory == None:
+            directory = os.environ.get("PPLTLF_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ppltlf"))
+        if maxBytes == None:
+            maxBytes = int(os.environ.get("PPLTLF_CACHE_SIZE", 256 * 1024 * 1024))
+
+        self.directory: str = directory
+        self.maxBytes: int = maxBytes
+
+    @classmethod
+    def default(cls) -> "DfaCache | None":
+        """Returns the cache used by the formula constructor of FiniteAutomaton,
+        None unless it is enabled by setting PPLTLF_CACHE=1. The directory and the
+        maximum size are read from PPLTLF_CACHE_DIR and PPLTLF_CACHE_SIZE."""
+
+        if os.environ.get("PPLTLF_CACHE", "0") != "1":
+            return None
+
+        if cls._default == None:
+            cls._default = DfaCache()
+
+        return cls._default
+
+    @classmethod
+    def monaVersion(cls) -> str:
+        """Returns the first line printed by "mona --version", so that the entries 
+        written with an other version of MONA are not used ("" if MONA cannot be run)."""
+
+        if cls._monaVersion == None:
+            import subprocess
+
+            try:
+                res = subprocess.run(["mona", "--version"], capture_output=True, text=True, timeout=10)
+                lines = (res.stdout + res.stderr).strip().splitlines()
+                cls._monaVersion = lines[0].strip() if len(lines) > 0 else ""
+            except (OSError, subprocess.SubprocessError):
+                cls._monaVersion = ""
+
+        return cls._monaVersion
+
+    def key(self, formula: str, symbolic: bool) -> str:
+        """Returns the key of a normalized formula (the string of the parsed formula)."""
+
+        import ltlf2dfa
+        from FiniteAutomaton import FiniteAutomaton
+
+        versions = f"{ltlf2dfa.__version__}:{DfaCache.monaVersion()}:{FiniteAutomaton.BINARY_VERSION}:{int(symbolic)}"
+
+        return hashlib.sha256((versions + "\n" + formula).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".dfa")
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the stored automaton, None if the key is not in the cache."""
+
+        path = self.path(key)
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Stores an automaton, errors are ignored since the cache is only an optimization."""
+
+        tmpPath = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            (fd, tmpPath) = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+
+            os.replace(tmpPath, self.path(key))
+            tmpPath = None
+
+            self.evict()
+        except OSError:
+            pass
+        finally:
+            if tmpPath != None:
+                try:
+                    os.remove(tmpPath)
+                except OSError:
+                    pass
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in maxBytes."""
+
+        entries: list[tuple[float, int, str]] = []
+        total = 0
+
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                if entry.name.endswith(".dfa"):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+                elif entry.name.endswith(".tmp") and now - stat.st_mtime > DfaCache.STALE_TIME:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+        entries.sort()
+
+        i = 0
+        while total > self.maxBytes and i < len(entries):
+            (_, size, path) = entries[i]
+
+            # Another process may have already removed it
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+            total -= size
+            i += 1
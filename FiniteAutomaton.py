@@ -1,67 +1,186 @@
-from itertools import combinations, chain
-from pylogics.parsers import parse_pl
-from pylogics.semantics.pl import evaluate_pl
+from array import array
+from typing import Iterable
+import io
+import struct
+import sys
+from Alphabet import Alphabet, SymbolicAlphabet
+from BDD import BDD
+
+def deepSize(obj: object, seen: set[int]) -> int:
+    """Returns the bytes used by an object and by the objects it references, 
+    skipping the objects in seen and adding the counted ones to it. The objects 
+    with a memory report (the automata, the TSA, ...) are not followed, they 
+    are counted by their own report. The size of a memoryview is the size of 
+    the viewed buffer."""
+    
+    size = 0
+    S = [obj]
+    
+    while len(S) > 0:
+        o = S.pop()
+        
+        if id(o) in seen or hasattr(type(o), "memoryReport") or isinstance(o, type):
+            continue
+        seen.add(id(o))
+        
+        size += o.nbytes if isinstance(o, memoryview) else sys.getsizeof(o)
+        
+        if isinstance(o, (str, bytes, int, float, array, memoryview)):
+            continue
+        
+        if isinstance(o, dict):
+            S.extend(o.keys())
+            S.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            S.extend(o)
+        else:
+            if hasattr(o, "__dict__"):
+                S.extend(vars(o).values())
+                
+            for cls in type(o).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    if hasattr(o, name):
+                        S.append(getattr(o, name))
+    
+    return size
+
+def memoryReport(obj: object, seen: set[int] | None = None) -> dict[str, int]:
+    """Returns the bytes used by each attribute of an object, the objects shared by 
+    more attributes are counted only in the first one. The attributes with their own 
+    memory report are given its total, and the total of the object is in "total"."""
+    
+    if seen == None:
+        seen = set()
+    seen.add(id(obj))
+    
+    report: dict[str, int] = {}
+    for (name, value) in vars(obj).items():
+        if hasattr(type(value), "memoryReport"):
+            report[name] = value.memoryReport(seen)["total"] if not (id(value) in seen) else 0
+        else:
+            report[name] = deepSize(value, seen)
+            
+    report["total"] = sys.getsizeof(obj) + sum(report.values())
+    
+    return report
 
 class Transition:
-    def __init__(self, target: "State", atomicPropositions: set[str], isEps: bool = False):
+    __slots__ = ("target", "letter", "isEps")
+    
+    def __init__(self, target: "State", letter: int, isEps: bool = False):
         self.target: State = target
-        self.ap: set[str] = atomicPropositions
+        
+        # Code of the letter in the alphabet of the automaton
+        self.letter: int = letter
         self.isEps = isEps
         
-    def evaluate(self, atProps: set[str]) -> bool:
-        """Return True if atProps satisfies the transition formula, False otherwise."""
+    def evaluate(self, letter: int) -> bool:
+        """Return True if the letter satisfies the transition formula, False otherwise."""
         
-        return self.ap == atProps
+        return self.letter == letter
     
-    def formulaToStr(self, allProps: set[str]) -> str:
+    def formulaToStr(self, alphabet: Alphabet) -> str:
         if self.isEps:
             return "eps"
         
         S = ""
-        for p in allProps:
+        for (mask, value) in alphabet.cubes(self.letter):
             if len(S) > 0:
-                S += " && "
-            if p in self.ap:
-                S += f"{p}"
-            else:
-                S += f"~({p})"
+                S += " || "
+                
+            C = ""
+            for i in range(len(alphabet.props)):
+                if not ((mask >> i) & 1):
+                    continue
+                if len(C) > 0:
+                    C += " && "
+                if (value >> i) & 1:
+                    C += f"{alphabet.props[i]}"
+                else:
+                    C += f"~({alphabet.props[i]})"
+                    
+            S += C if len(C) > 0 else "true"
         return S
     
     def __str__(self) -> str:
-        return f"-> {self.target.index} ({self.ap if not self.isEps else 'eps'})"
+        return f"-> {self.target.index} ({self.letter if not self.isEps else 'eps'})"
         
 class State:
-    def __init__(self, index: int) -> None:
+    __slots__ = ("index", "automaton", "successors", "epsilon")
+    
+    def __init__(self, index: int, automaton: "FiniteAutomaton") -> None:
         self.index: int = index
-        self.transitions: list[Transition] = []
+        self.automaton = automaton
         
-    def addTransition(self, target: "State", atomicPropositions: set[str], isEps: bool = False) -> None:
-        for t in self.transitions:
-            if t.target == target and t.ap.issubset(atomicPropositions) and atomicPropositions.issubset(t.ap):
-                return
+        # Sparse transitions, used only if the automaton is not deterministic:
+        # successors[letter] are the targets with the letter and epsilon 
+        # are the targets of the epsilon transitions
+        self.successors: dict[int, list[State]] = {}
+        self.epsilon: list[State] = []
         
-        self.transitions.append(Transition(target, atomicPropositions, isEps))
+    @property
+    def transitions(self) -> list[Transition]:
+        """The transitions exiting the state."""
         
-    def computeTransition(self, atomicPropositions: set[str]) -> set["State"]:
+        res: list[Transition] = []
+        
+        if self.automaton.deterministic:
+            table = self.automaton.table
+            size = len(self.automaton.alphabet)
+            states = self.automaton.states
+            
+            for s in range(size):
+                target = table[self.index * size + s]
+                if target >= 0:
+                    res.append(Transition(states[target], s))
+        else:
+            for target in self.epsilon:
+                res.append(Transition(target, 0, True))
+                
+            for s in self.successors:
+                for target in self.successors[s]:
+                    res.append(Transition(target, s))
+                    
+        return res
+        
+    def addTransition(self, target: "State", letter: int, isEps: bool = False) -> None:
+        if self.automaton.deterministic:
+            assert not isEps, print("Epsilon transition in a deterministic automaton")
+            
+            pos = self.index * len(self.automaton.alphabet) + letter
+            assert self.automaton.table[pos] < 0 or self.automaton.table[pos] == target.index
+            
+            self.automaton.table[pos] = target.index
+        elif isEps:
+            if not (target in self.epsilon):
+                self.epsilon.append(target)
+        elif letter in self.successors:
+            if not (target in self.successors[letter]):
+                self.successors[letter].append(target)
+        else:
+            self.successors[letter] = [target]
+        
+    def computeTransition(self, letter: int) -> set["State"]:
         """Computes the set of states reachable from this one with the given
-        atomic propositions. The result set can contain more than one transition only
+        letter. The result set can contain more than one transition only
         if this is a non deterministic automaton"""
         
-        res: set["State"] = set()
+        if self.automaton.deterministic:
+            target = self.automaton.table[self.index * len(self.automaton.alphabet) + letter]
+            
+            return {self.automaton.states[target]} if target >= 0 else set()
         
-        for t in self.transitions:
-            if t.isEps:
-                res = res.union(t.target.computeTransition(atomicPropositions))
-            else:
-                if t.evaluate(atomicPropositions):
-                    res.add(t.target)
+        res: set["State"] = set(self.successors.get(letter, ()))
+        
+        for target in self.epsilon:
+            res.update(target.computeTransition(letter))
             
         return res
     
-    def transitionsToDot(self, allProps: set[str]) -> str:
+    def transitionsToDot(self, alphabet: Alphabet) -> str:
         S = ""
         for t in self.transitions:
-            S += f"\t{self.index} -> {t.target.index} [label=\"{t.formulaToStr(allProps)}\"];\n"
+            S += f"\t{self.index} -> {t.target.index} [label=\"{t.formulaToStr(alphabet)}\"];\n"
         return S
     
     def __str__(self):
@@ -71,167 +190,422 @@ class State:
         return S
 
 class FiniteAutomaton:
-    def __init__(self, statesNumber: int = 0, atomicProps: set[str] = set(), formulaStr: str = ""):
+    # Parser of the LTLf formulas, shared by all the automata
+    _ltlfParser = None
+    
+    # Binary format written by toBytes and save
+    BINARY_MAGIC = b"PPLTLFA\0"
+    BINARY_VERSION = 1
+    BINARY_HEADER = "<8sHBxIIIIQ"
+    
+    def __init__(self, statesNumber: int = 0, atomicProps: set[str] = set(), formulaStr: str = "", deterministic: bool = False, 
+                 alphabet: Alphabet | None = None, symbolic: bool = False):
         """The automaton can either be created by passing the number of states, 
-        and the atomic propsitions of the formula or by passing a string 
-        representing an LTLf formula"""
+        and the atomic propsitions of the formula (or directly its alphabet) or 
+        by passing a string representing an LTLf formula.
+        
+        The transitions of a deterministic automaton are stored in a dense table 
+        indexed by state and letter, table[q * |alphabet| + s] is the target of q
+        with the letter s (or -1 if there is no such transition).
+        
+        If symbolic is True the edge labels of the formula automaton are kept as BDD guards, 
+        and the letters of the automaton are the atoms of the partition induced by the guards
+        instead of all the propositional interpretations."""
         
         if formulaStr != "":
-            from parse import parse
             from ltlf2dfa.parser.ltlf import LTLfParser
             import re
             
-            self.atomicProps: set[str] = set(re.findall('[a-z]+', formulaStr))
-            if "true" in self.atomicProps: self.atomicProps.remove("true")
-            if "false" in self.atomicProps: self.atomicProps.remove("false")
+            atomicProps: set[str] = set(re.findall('[a-z]+', formulaStr))
+            if "true" in atomicProps: atomicProps.remove("true")
+            if "false" in atomicProps: atomicProps.remove("false")
             
-            parser = LTLfParser()
-            formula = parser(formulaStr)
-
-            dotsFormat = formula.to_dfa(False)
+            # Building the parser takes much longer than parsing a formula
+            if FiniteAutomaton._ltlfParser == None:
+                FiniteAutomaton._ltlfParser = LTLfParser()
+            formula = FiniteAutomaton._ltlfParser(formulaStr)
             
-            strLines = dotsFormat.splitlines()
+            from DfaCache import DfaCache
             
-            firstLineT = parse("digraph {name} {", strLines[0])
+            cache = DfaCache.default()
+            key = cache.key(str(formula), symbolic) if cache != None else ""
+            data = cache.get(key) if cache != None else None
             
-            self.name = firstLineT["name"]
+            if data != None:
+                try:
+                    self.readBytes(data)
+                except (ValueError, IndexError, struct.error):
+                    # Corrupted entry, it is overwritten below
+                    data = None
+                    
+            if data == None:
+                self.readMona(io.StringIO(formula.to_dfa(True)), atomicProps, symbolic)
+                
+                if cache != None:
+                    cache.put(key, self.toBytes())
             
-            initLine = strLines[9].split("->")
-    
-            acceptingLine = strLines[6].split(";")
-            acceptingLine = acceptingLine[1:len(acceptingLine) - 1]
+        else:
+            self.statesNumber: int = statesNumber
+            self.deterministic: bool = deterministic
+            self.states: list[State] = [State(i, self) for i in range(self.statesNumber)]
+            self.initState: State = self.states[0]
+            self.acceptingStates: list[State] = []
+            self.alphabet: Alphabet = alphabet if alphabet != None else Alphabet.of(atomicProps)
+            self.atomicProps: set[str] = set(self.alphabet.props)
+            self.table: array = array('i', [-1]) * (self.statesNumber * len(self.alphabet) if deterministic else 0)
+        
+    def readMona(self, lines: Iterable[str], atomicProps: set[str], symbolic: bool = False) -> None:
+        """Initializes the automaton from the output of MONA for an LTLf formula.
+        
+        The lines are read one at a time. Each transition of MONA is labelled by a cube
+        over the free variables (a string of 0, 1 and X), which is converted to a bitmask 
+        over the sorted propositions and expanded directly into the letters (or into a 
+        BDD guard in symbolic mode). The MONA state 0 is the dummy initial state added 
+        by ltlf2dfa, so the MONA state i is the state i - 1 of the automaton."""
+        
+        props = sorted(atomicProps)
+        propIndex: dict[str, int] = {props[i]: i for i in range(len(props))}
+        
+        # varBits[k] is the bit of the proposition of the k-th free variable
+        varBits: list[int] = []
+        statesNumber = 0
+        accepting: list[int] = []
+        unsatisfiable = False
+        
+        # Transitions as consecutive (start, target, mask, value) quadruples
+        cubes: array = array('q')
+        
+        for line in lines:
+            if line.startswith("State "):
+                (source, rest) = line[6:].split(":", 1)
+                
+                start = int(source) - 1
+                if start < 0:
+                    continue
+                
+                (guard, target) = rest.split("->")
+                
+                mask = 0
+                value = 0
+                for (c, bit) in zip(guard.strip(), varBits):
+                    if c == "1":
+                        mask |= bit
+                        value |= bit
+                    elif c == "0":
+                        mask |= bit
+                        
+                cubes.extend((start, int(target.split()[1]) - 1, mask, value))
+                
+            elif line.startswith("DFA for formula with free variables:"):
+                varBits = [1 << propIndex[v.lower()] for v in line.split(":", 1)[1].split()]
+                
+            elif line.startswith("Accepting states:"):
+                accepting = [int(q) - 1 for q in line.split(":", 1)[1].split() if int(q) > 0]
+                
+            elif line.startswith("Automaton has"):
+                statesNumber = int(line.split()[2]) - 1
+                
+            elif "Formula is unsatisfiable" in line:
+                unsatisfiable = True
+                
+        if unsatisfiable:
+            # A single rejecting state with a self loop
+            statesNumber = 1
+            accepting = []
+            cubes = array('q', [0, 0, 0, 0])
             
-            strLines = strLines[10:len(strLines) - 1]
+        if symbolic:
+            bdd = BDD(len(props))
             
-            self.states: list[State] = [State(i) for i in range(len(strLines))]
-            self.statesNumber = len(strLines)
+            # Guard of each pair of states
+            edgeGuards: dict[tuple[int, int], int] = {}
+            for i in range(0, len(cubes), 4):
+                edge = (cubes[i], cubes[i + 1])
+                edgeGuards[edge] = bdd.disj(edgeGuards.get(edge, BDD.FALSE), bdd.cube(cubes[i + 2], cubes[i + 3]))
+                
+            self.alphabet: Alphabet = SymbolicAlphabet.fromGuards(props, bdd, edgeGuards.values())
+        else:
+            self.alphabet: Alphabet = Alphabet.of(props)
             
-            self.acceptingStates: list[State] = []
-            for n in acceptingLine:
-                self.acceptingStates.append(self.states[int(n) - 1])
+        self.atomicProps: set[str] = set(props)
+        self.deterministic: bool = True
+        self.statesNumber: int = statesNumber
+        self.states: list[State] = [State(i, self) for i in range(statesNumber)]
+        
+        size = len(self.alphabet)
+        self.table: array = array('i', [-1]) * (statesNumber * size)
+        
+        if symbolic:
+            # Each atom is either contained in the guard or disjoint from it
+            for ((start, target), g) in edgeGuards.items():
+                for s in self.alphabet:
+                    if bdd.conj(self.alphabet.guard(s), g) != BDD.FALSE:
+                        self.table[start * size + s] = target
+        else:
+            for i in range(0, len(cubes), 4):
+                (start, target, mask, value) = (cubes[i], cubes[i + 1], cubes[i + 2], cubes[i + 3])
                 
-            self.initState: State = self.states[int(initLine[1].removesuffix(";")) - 1]
+                # Enumerate the letters of the cube, i.e. all the subsets of the free bits
+                free = (size - 1) & ~mask
+                sub = free
+                while True:
+                    self.table[start * size + (value | sub)] = target
+                    
+                    if sub == 0:
+                        break
+                    sub = (sub - 1) & free
+                    
+        self.acceptingStates: list[State] = [self.states[q] for q in accepting]
+        self.initState: State = self.states[0]
+        
+    def memoryReport(self, seen: set[int] | None = None) -> dict[str, int]:
+        """Returns the bytes used by each component of the automaton (states, table, 
+        alphabet, ...) and their total in "total". If the table is mapped from a file 
+        its size is the size of the mapping."""
+        
+        return memoryReport(self, seen)
+        
+    def binaryHeader(self) -> bytes:
+        """Returns the part of the binary form preceding the transition table.
+        
+        All the integers are little endian. The fixed header contains the magic 
+        string, the version of the format, the symbolic flag, the number of 
+        propositions, the size of the alphabet, the number of states, the initial 
+        state and the offset of the table. It is followed by the sorted propositions
+        (each one as its length and UTF-8 bytes), the guards of the letters as lists 
+        of cubes if the alphabet is symbolic and the bitset of the accepting states. 
+        The table of 32 bit integers starts at an offset multiple of 8, so that it 
+        can be mapped in memory."""
+        
+        assert self.deterministic, print("Only deterministic automata can be serialized")
+        
+        symbolic = isinstance(self.alphabet, SymbolicAlphabet)
+        
+        data = bytearray()
+        
+        for p in self.alphabet.props:
+            name = p.encode("utf-8")
+            data += struct.pack("<H", len(name)) + name
             
+        if symbolic:
+            for s in self.alphabet:
+                cubes = self.alphabet.cubes(s)
+                data += struct.pack("<I", len(cubes))
+                for (mask, value) in cubes:
+                    data += struct.pack("<QQ", mask, value)
             
-            for line in strLines:
-                T = parse(" {start} -> {target} [label=\"{label}\"];", line)
-
-                formula = parse_pl(T["label"])        
+        accepting = bytearray((self.statesNumber + 7) // 8)
+        for state in self.acceptingStates:
+            accepting[state.index >> 3] |= 1 << (state.index & 7)
+        data += accepting
+        
+        headerSize = struct.calcsize(FiniteAutomaton.BINARY_HEADER)
+        tableOffset = (headerSize + len(data) + 7) // 8 * 8
+        data += bytes(tableOffset - headerSize - len(data))
+        
+        header = struct.pack(FiniteAutomaton.BINARY_HEADER, FiniteAutomaton.BINARY_MAGIC, FiniteAutomaton.BINARY_VERSION, 
+                             int(symbolic), len(self.alphabet.props), len(self.alphabet), self.statesNumber, 
+                             self.initState.index, tableOffset)
+        
+        return header + bytes(data)
+    
+    def binaryTable(self) -> memoryview | array:
+        """Returns the transition table in little endian byte order."""
+        
+        if sys.byteorder == "big":
+            table = array('i', self.table)
+            table.byteswap()
+            return table
+        
+        return self.table
+    
+    def toBytes(self) -> bytes:
+        """Returns the binary form of a deterministic automaton, read back by readBytes."""
+        
+        return self.binaryHeader() + bytes(self.binaryTable())
+    
+    def save(self, path: str) -> None:
+        """Writes the binary form of a deterministic automaton to a file."""
+        
+        with open(path, "wb") as f:
+            f.write(self.binaryHeader())
+            f.write(self.binaryTable())
+    
+    @classmethod
+    def load(cls, path: str, mapped: bool = True) -> "FiniteAutomaton":
+        """Reads an automaton written by save. 
+        
+        If mapped is True the transition table is a read-only memory map of the file, 
+        shared by all the processes loading the same file: the loaded automaton 
+        cannot be modified, but all the operations returning a new automaton can 
+        be used."""
+        
+        fa = cls.__new__(cls)
+        
+        with open(path, "rb") as f:
+            if mapped and sys.byteorder == "little":
+                import mmap
                 
-                alphabet_it = chain.from_iterable(combinations(self.atomicProps, r) for r in range(len(self.atomicProps) + 1))
+                # The map stays valid after closing the file, and it is kept 
+                # alive by the views on it
+                fa.readBytes(memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)))
+            else:
+                fa.readBytes(f.read())
+                
+        return fa
+    
+    def readBytes(self, data: bytes | memoryview) -> None:
+        """Initializes the automaton from the binary form returned by toBytes. If data
+        is a memoryview the table is not copied and it is a read-only view on it."""
+        
+        headerSize = struct.calcsize(FiniteAutomaton.BINARY_HEADER)
+        if len(data) < headerSize:
+            raise ValueError("Truncated automaton")
+        
+        (magic, version, symbolic, propsNumber, alphabetSize, statesNumber, init, tableOffset) = \
+            struct.unpack_from(FiniteAutomaton.BINARY_HEADER, data, 0)
             
-                for s in alphabet_it:
-                    if evaluate_pl(formula, set(s)):
-                        self.states[int(T["start"]) - 1].addTransition(self.states[int(T["target"]) - 1], set(s))
+        if magic != FiniteAutomaton.BINARY_MAGIC:
+            raise ValueError("Not an automaton")
+        if version != FiniteAutomaton.BINARY_VERSION:
+            raise ValueError(f"Unsupported version of the automaton format: {version}")
+        if len(data) != tableOffset + 4 * statesNumber * alphabetSize:
+            raise ValueError("Truncated automaton")
+        
+        offset = headerSize
+        
+        props: list[str] = []
+        for _ in range(propsNumber):
+            (length,) = struct.unpack_from("<H", data, offset)
+            offset += 2
+            props.append(bytes(data[offset:offset + length]).decode("utf-8"))
+            offset += length
             
+        if symbolic:
+            bdd = BDD(len(props))
+            guards: list[int] = []
+            for _ in range(alphabetSize):
+                (cubesNumber,) = struct.unpack_from("<I", data, offset)
+                offset += 4
+                
+                g = BDD.FALSE
+                for _ in range(cubesNumber):
+                    (mask, value) = struct.unpack_from("<QQ", data, offset)
+                    offset += 16
+                    g = bdd.disj(g, bdd.cube(mask, value))
+                guards.append(g)
+                
+            self.alphabet: Alphabet = SymbolicAlphabet(props, bdd, guards)
         else:
-            self.statesNumber: int = statesNumber
-            self.states: list[State] = [State(i) for i in range(self.statesNumber)]
-            self.initState: State = self.states[0]
-            self.acceptingStates: list[State] = []
-            self.atomicProps = atomicProps
+            self.alphabet: Alphabet = Alphabet.of(props)
+            
+        if len(self.alphabet) != alphabetSize:
+            raise ValueError("Wrong size of the alphabet")
+            
+        accepting = bytes(data[offset:offset + (statesNumber + 7) // 8])
         
-    def addTransition(self, start: State, target: State, atomicPropositions: set[str]):
-        """Add a new transition"""
+        if isinstance(data, memoryview) and sys.byteorder == "little":
+            self.table: array | memoryview = data[tableOffset:].cast('i')
+        else:
+            self.table: array | memoryview = array('i')
+            self.table.frombytes(data[tableOffset:])
+            if sys.byteorder == "big":
+                self.table.byteswap()
+            
+        self.atomicProps: set[str] = set(props)
+        self.deterministic: bool = True
+        self.statesNumber: int = statesNumber
+        self.states: list[State] = [State(i, self) for i in range(statesNumber)]
+        self.initState: State = self.states[init]
+        self.acceptingStates: list[State] = [self.states[q] for q in range(statesNumber) if (accepting[q >> 3] >> (q & 7)) & 1]
+        
+    def addTransition(self, start: State, target: State, letter: int):
+        """Add a new transition, the letter is given by its code in the alphabet"""
 
-        self.states[start.index].addTransition(target, atomicPropositions)
+        self.states[start.index].addTransition(target, letter)
         
     def reverseTransitions(self, reduce: bool = False) -> "FiniteAutomaton":
         """Returns a FA obtained from reversing all the transitions. 
         The FA generated is non deterministic, but has complete transitions."""
         
-        nfa = FiniteAutomaton(self.statesNumber + 2, self.atomicProps) 
+        nfa = FiniteAutomaton(self.statesNumber + 2, alphabet=self.alphabet) 
 
         for state in self.states:
             for t in state.transitions:
-                nfa.states[t.target.index].addTransition(nfa.states[state.index], t.ap)
+                nfa.states[t.target.index].addTransition(nfa.states[state.index], t.letter)
         
         nfa.acceptingStates = [nfa.states[self.initState.index]]
         
         sinkState = nfa.states[nfa.statesNumber - 1]
         nfa.initState = nfa.states[nfa.statesNumber - 2]
         for state in self.acceptingStates:
-            nfa.initState.addTransition(nfa.states[state.index], set(), True)
+            nfa.initState.addTransition(nfa.states[state.index], 0, True)
         
         for state in nfa.states:
-            alphabet_it = chain.from_iterable(combinations(self.atomicProps, r) for r in range(len(self.atomicProps) + 1))
-
-            for s in alphabet_it:
-                if len(state.computeTransition(set(s))) == 0:
-                    nfa.addTransition(state, sinkState, set(s))
+            for s in self.alphabet:
+                if len(state.computeTransition(s)) == 0:
+                    nfa.addTransition(state, sinkState, s)
                     
         if reduce:
             return nfa.removeUnreachableStates()
             
         return nfa
     
-    def statesPowersetIterator(self):
-        """Returns an iterator that cylces over the ordered powerset of the automaton states"""
-        
-        s = self.states
-        return chain.from_iterable(combinations(s, r) for r in range(1, len(s) + 1))
-    
     def determinize(self, reduce: bool = False) -> "FiniteAutomaton":
-        """Return the determinized automaton of this automaton"""
+        """Return the determinized automaton of this automaton.
+        
+        Only the subsets of states reachable from the (epsilon closed) initial 
+        state are generated, so the size of the result depends on the reachable 
+        part of the powerset and not on the whole powerset."""
         
-        # The new DFA has 2^n - 1 states (Cardinality of the power set minus the empty set)
-        dfa = FiniteAutomaton(pow(2, self.statesNumber) - 1, self.atomicProps)
-
-        # For each subset of the states save its index in the ordered powerset
-        # The index is used as the id of the subset in the new automaton
-        powerStateIndex = {}
-        statesPowersetIter = self.statesPowersetIterator()
-        
-        for i in range(0, dfa.statesNumber):
-            currNewState = next(statesPowersetIter)
-            currNewStateIdx = set()
-            for m in currNewState:
-                currNewStateIdx.add(m.index)
-            powerStateIndex[str(currNewStateIdx)] = i
-            
         epsClosure = {self.initState.index}
         for t in self.initState.transitions:
             if t.isEps:
                 epsClosure.add(t.target.index)
                 
-        dfa.initState = dfa.states[powerStateIndex[str(epsClosure)]]
-            
-        # Compute the new transitions, every new state (a subset 
-        # of the old states) is associated with its index i.
-        # i is the index of the subset in the sorted powerset
-        statesPowersetIter = self.statesPowersetIterator()
-        for i in range(0, dfa.statesNumber):
-            currNewState = next(statesPowersetIter)
-
-            # The subset of the old states containg only the initial old state 
-            # is the new initial state
-            # if (len(currNewState) == 1 and currNewState[0] == self.initState):
-            #     dfa.initState = dfa.states[i]
-                    
-            alphabet_it = chain.from_iterable(combinations(self.atomicProps, r) for r in range(len(self.atomicProps) + 1))
+        acceptingIdx: set[int] = {q.index for q in self.acceptingStates}
+        
+        # Each subset of the old states is identified by the frozenset of the indexes 
+        # of its states, the subsets are numbered in the order they are discovered
+        initSubset = frozenset(epsClosure)
+        subsetIndex: dict[frozenset[int], int] = {initSubset: 0}
+        subsets: list[frozenset[int]] = [initSubset]
+        
+        # Transitions of the new automaton as (start, target, letter)
+        newTransitions: list[tuple[int, int, int]] = []
+        
+        # The list of subsets is also the worklist, i is the first subset 
+        # whose transitions have not been computed yet
+        i = 0
+        while i < len(subsets):
+            currStates: set[State] = {self.states[q] for q in subsets[i]}
             
-            for s in alphabet_it:
-                targetState: set[State] = set()
+            for s in self.alphabet:
+                targetSubset = frozenset(self.computeSetTransition(currStates, s))
+                
+                if len(targetSubset) == 0:
+                    continue
                 
-                currNewStateIdx = set()
-                for m in currNewState:
-                    currNewStateIdx.add(m.index)
+                targetIdx = subsetIndex.get(targetSubset)
+                if targetIdx == None:
+                    targetIdx = len(subsets)
+                    subsetIndex[targetSubset] = targetIdx
+                    subsets.append(targetSubset)
                     
-                for state in currNewState:
-                    targetState = targetState.union(state.computeTransition(set(s)))
-
-                    # If there is an intersection beetween the old accepting state
-                    # and the new current state i add i to the new accepting states
-                    for oldAcceptingState in self.acceptingStates:
-                        if oldAcceptingState.index == state.index:
-                            dfa.acceptingStates.append(dfa.states[powerStateIndex[str(currNewStateIdx)]])
-                            break
+                newTransitions.append((i, targetIdx, s))
                 
-                if len(targetState) > 0:
-                    targetStateIdx = set()
-                    for m in targetState:
-                        targetStateIdx.add(m.index)
-                    dfa.states[i].addTransition(dfa.states[powerStateIndex[str(targetStateIdx)]], set(s))
+            i += 1
+        
+        dfa = FiniteAutomaton(len(subsets), alphabet=self.alphabet, deterministic=True)
+        dfa.initState = dfa.states[0]
+        
+        for (start, target, s) in newTransitions:
+            dfa.states[start].addTransition(dfa.states[target], s)
+        
+        # A subset is accepting if it contains at least one old accepting state
+        for i in range(len(subsets)):
+            if not acceptingIdx.isdisjoint(subsets[i]):
+                dfa.acceptingStates.append(dfa.states[i])
 
         if reduce:
             return dfa.minimize()
@@ -239,104 +613,108 @@ class FiniteAutomaton:
         return dfa
     
     def minimize(self) -> "FiniteAutomaton":
-        # print("------")
-        # print(self)
-        # self.visualize("reduced1", "imgs/trn/")
+        """Return the minimal automaton equivalent to this deterministic automaton.
+        
+        The states are partitioned using Hopcroft's algorithm, missing transitions
+        are treated as transitions to an implicit sink state."""
+        
         reduced = self.removeUnreachableStates()
-        # print(reduced)
-        # reduced.visualize("reduced", "imgs/trn/")
         
-        P: list[set[int]] = [set([s.index for s in reduced.acceptingStates]), set()]
-        W: list[set[int]] = [set([s.index for s in reduced.acceptingStates]), set()]
-    
-        for s in reduced.states:
-            if s not in reduced.acceptingStates:
-                P[1].add(s.index)
-                W[1].add(s.index)
-                
-        if len(P[1]) == 0:
-            P.remove(P[1])
-            W.remove(W[1])
-                
+        n = reduced.statesNumber
+        sink = n
+        
+        alphabet = reduced.alphabet
+        
+        # Inverse of the transition function, inverse[a][q] contains 
+        # the indexes of the states reaching q with the letter a
+        inverse: list[list[list[int]]] = [[[] for _ in range(n + 1)] for _ in alphabet]
+        
+        for a in alphabet:
+            inverse[a][sink].append(sink)
+            
+            for state in reduced.states:
+                targets = state.computeTransition(a)
+                target = sink if len(targets) == 0 else next(iter(targets)).index
+                inverse[a][target].append(state.index)
+        
+        acceptingIdx: set[int] = {q.index for q in reduced.acceptingStates}
+        
+        # blocks[i] is the i-th block of the partition and 
+        # blockOf[q] is the index of the block containing q
+        blocks: list[set[int]] = []
+        blockOf: list[int] = [0] * (n + 1)
+        
+        for part in (acceptingIdx, set(range(n + 1)).difference(acceptingIdx)):
+            if len(part) > 0:
+                for q in part:
+                    blockOf[q] = len(blocks)
+                blocks.append(set(part))
+        
+        # Worklist of the splitters, inW[i] is True if the i-th block is in W
+        W: list[int] = [0 if len(blocks) == 1 or len(blocks[0]) <= len(blocks[1]) else 1]
+        inW: list[bool] = [False] * len(blocks)
+        inW[W[0]] = True
+        
         while len(W) > 0:
             A = W.pop()
+            inW[A] = False
             
-            alphabet_it = chain.from_iterable(combinations(reduced.atomicProps, r) for r in range(len(reduced.atomicProps) + 1))
+            splitter = list(blocks[A])
             
-            for s in alphabet_it:
-                X = set()
-                for state in reduced.states:
-                    if list(state.computeTransition(set(s)))[0].index in A:
-                        X.add(state.index)
-                        
-                newSets = []
-                removeSet = []
-                for Y in P:
-                    interSet = X.intersection(Y)
-                    diffSet = Y.difference(X)
-                    if len(interSet) > 0 and len(diffSet) > 0:
-                        removeSet.append(Y)
-                        newSets.append(interSet)
-                        newSets.append(diffSet)
-                        
-                for i in range(len(removeSet)):
-                    Y = removeSet[i]
+            for a in alphabet:
+                # Predecessors of the splitter grouped by their block
+                X: dict[int, list[int]] = {}
+                for q in splitter:
+                    for p in inverse[a][q]:
+                        if blockOf[p] in X:
+                            X[blockOf[p]].append(p)
+                        else:
+                            X[blockOf[p]] = [p]
+                
+                for Y in X:
+                    if len(X[Y]) == len(blocks[Y]):
+                        continue
                     
-                    if Y in P:
-                        P.remove(Y)
+                    # Split Y, the states reaching the splitter are moved to a new block
+                    newIdx = len(blocks)
+                    newBlock = set(X[Y])
+                    blocks[Y].difference_update(newBlock)
                     
-                    if Y in W:
-                        W.remove(Y)
-                        W.append(newSets[i * 2])
-                        W.append(newSets[i * 2 + 1])
+                    for p in newBlock:
+                        blockOf[p] = newIdx
+                        
+                    blocks.append(newBlock)
+                    inW.append(False)
+                    
+                    if inW[Y] or len(newBlock) <= len(blocks[Y]):
+                        W.append(newIdx)
+                        inW[newIdx] = True
                     else:
-                        if (len(newSets[i * 2]) < len(newSets[i * 2 + 1])):
-                            W.append(newSets[i * 2])
-                        else:
-                            W.append(newSets[i * 2 + 1])
-                            
-                P.extend(newSets)
+                        W.append(Y)
+                        inW[Y] = True
+        
+        # Each block containing a state of the automaton becomes a new state, 
+        # the block transitions are the ones of its first state
+        newIndex: list[int] = [-1] * len(blocks)
+        representatives: list[int] = []
+        
+        for q in range(n):
+            if newIndex[blockOf[q]] < 0:
+                newIndex[blockOf[q]] = len(representatives)
+                representatives.append(q)
                     
-        minDFA = FiniteAutomaton(len(P), reduced.atomicProps)
+        minDFA = FiniteAutomaton(len(representatives), alphabet=reduced.alphabet, deterministic=True)
         
-        # print("P:")
-        # for p in P:
-        #     print(p, end=", ")
-        # print()
-        
-        for i in range(len(P)):
-            statesSet = P[i]
-            # print(statesSet)
-            
-            alphabet_it = chain.from_iterable(combinations(reduced.atomicProps, r) for r in range(len(reduced.atomicProps) + 1))
+        for i in range(len(representatives)):
+            q = representatives[i]
             
-            for s in alphabet_it:
-                targetSubset = set()
-                for q in statesSet:
-                    for state in reduced.states[q].computeTransition(set(s)):
-                        targetSubset.add(state.index)
-                # print("p: ", statesSet, ", s:", s, ", target:", targetSubset)
-                
-                for q in targetSubset:
-                    for j in range(len(P)):
-                        if q in P[j]:
-                            minDFA.addTransition(minDFA.states[i], minDFA.states[j], set(s))
-                            break
-                     
+            for t in reduced.states[q].transitions:
+                minDFA.addTransition(minDFA.states[i], minDFA.states[newIndex[blockOf[t.target.index]]], t.letter)
                 
-            # for s in alphabet_it:
-            #     target = list(reduced.states[q].computeTransition(set(s)))[0]
-            #     for j in range(len(P)):
-            #         if target.index in P[j]:
-            #             minDFA.addTransition(minDFA.states[i], minDFA.states[j], set(s))
-            #             break
+            if q in acceptingIdx:
+                minDFA.acceptingStates.append(minDFA.states[i])
                 
-            for idx in statesSet:
-                if reduced.states[idx] in reduced.acceptingStates:
-                    minDFA.acceptingStates.append(minDFA.states[i])
-                    
-                if reduced.states[idx] == reduced.initState:
-                    minDFA.initState = minDFA.states[i]              
+        minDFA.initState = minDFA.states[newIndex[blockOf[reduced.initState.index]]]
                     
         return minDFA
 
@@ -350,15 +728,13 @@ class FiniteAutomaton:
             temp: set[int] = set()
             
             for q in newStates:
-                alphabet_it = chain.from_iterable(combinations(self.atomicProps, r) for r in range(len(self.atomicProps) + 1))
-            
-                for s in alphabet_it:
-                    temp = temp.union(self.computeSetTransition({self.states[q]}, list(s)))
+                for s in self.alphabet:
+                    temp = temp.union(self.computeSetTransition({self.states[q]}, s))
                     
             newStates = temp.difference(reachable)
             reachable = reachable.union(newStates)
             
-        FA = FiniteAutomaton(len(reachable), self.atomicProps)  
+        FA = FiniteAutomaton(len(reachable), alphabet=self.alphabet, deterministic=self.deterministic)
             
         newStateId: list[int] = [-1 for _ in range(self.statesNumber)]
         reachableL = list(reachable)
@@ -377,28 +753,211 @@ class FiniteAutomaton:
             
             for t in oldState.transitions:
                 if t.target.index in reachable:
-                    FA.states[newStateId[q]].addTransition(FA.states[newStateId[t.target.index]], t.ap, t.isEps)
+                    FA.states[newStateId[q]].addTransition(FA.states[newStateId[t.target.index]], t.letter, t.isEps)
         
         return FA    
     
-    def computeSetTransition(self, statesSet: set[State], propositionalInterpretation: list[str]) -> set[int]:
+    def compressAlphabet(self) -> "FiniteAutomaton":
+        """Returns an equivalent automaton whose letters are the classes of the letters
+        of this automaton with the same transitions in every state.
+        
+        Each class becomes a letter of a symbolic alphabet whose guard is the disjunction 
+        of the guards of its letters, so the following constructions work on one 
+        representative for each class."""
+        
+        size = len(self.alphabet)
+        
+        # Letters with the same signature have the same transitions in every state
+        classOf: dict[object, int] = {}
+        representatives: list[int] = []
+        members: list[list[int]] = []
+        
+        for s in self.alphabet:
+            signature: object
+            if self.deterministic:
+                signature = self.table[s::size].tobytes()
+            else:
+                signature = tuple(tuple(sorted(t.index for t in state.successors.get(s, ()))) for state in self.states)
+            
+            c = classOf.get(signature)
+            if c == None:
+                classOf[signature] = len(representatives)
+                representatives.append(s)
+                members.append([s])
+            else:
+                members[c].append(s)
+                
+        if isinstance(self.alphabet, SymbolicAlphabet):
+            bdd = self.alphabet.bdd
+            letterGuard = self.alphabet.guard
+        else:
+            bdd = BDD(len(self.alphabet.props))
+            letterGuard = lambda s: bdd.cube(size - 1, s)
+            
+        guards: list[int] = []
+        for letters in members:
+            g = BDD.FALSE
+            for s in letters:
+                g = bdd.disj(g, letterGuard(s))
+            guards.append(g)
+            
+        FA = FiniteAutomaton(self.statesNumber, alphabet=SymbolicAlphabet(self.alphabet.props, bdd, guards), deterministic=self.deterministic)
+        
+        for state in self.states:
+            for c in range(len(representatives)):
+                targets: Iterable[State]
+                if self.deterministic:
+                    targets = state.computeTransition(representatives[c])
+                else:
+                    targets = state.successors.get(representatives[c], [])
+                    
+                for target in targets:
+                    FA.states[state.index].addTransition(FA.states[target.index], c)
+            
+            for target in state.epsilon:
+                FA.states[state.index].addTransition(FA.states[target.index], 0, True)
+                
+        FA.initState = FA.states[self.initState.index]
+        FA.acceptingStates = [FA.states[q.index] for q in self.acceptingStates]
+        
+        return FA
+    
+    def computeSetTransition(self, statesSet: set[State], letter: int) -> set[int]:
         """Given a set of states returns all the indexes of the state reachable with the given 
-        propositional interpretation"""
+        letter"""
         
-        # TODO: prop_int list[str] -> set[str]
         S: set[int] = set()
         
+        if self.deterministic:
+            size = len(self.alphabet)
+            
+            for q in statesSet:
+                target = self.table[q.index * size + letter]
+                if target >= 0:
+                    S.add(target)
+                    
+            return S
+        
         for q in statesSet:
-            for state in q.computeTransition(set(propositionalInterpretation)):
+            for state in q.computeTransition(letter):
                 S.add(state.index)
         
         return S
     
+    def computeEpsilonClosure(self, statesSet: set[State]) -> set[State]:
+        """Returns the states reachable from the given ones with epsilon transitions, 
+        including the given states."""
+        
+        closure: set[State] = set(statesSet)
+        
+        S: list[State] = list(statesSet)
+        while len(S) > 0:
+            for target in S.pop().epsilon:
+                if not (target in closure):
+                    closure.add(target)
+                    S.append(target)
+                    
+        return closure
+    
+    def computeTransition(self, state: int, letter: int) -> int:
+        """Returns the index of the target of a deterministic automaton
+        (-1 if there is no transition)"""
+        
+        return self.table[state * len(self.alphabet) + letter]
+    
     def recognizeWord(self, state: State, word: list[set[str]]) -> bool:
-        if len(word) == 0:
-            return state in self.acceptingStates
+        """Returns True if the word is accepted starting from the given state."""
+        
+        return self.recognizeCodes(state, [self.alphabet.encode(letter) for letter in word])
+    
+    def recognizeCodes(self, state: State, codes: Iterable[int]) -> bool:
+        """Returns True if the word, given as the codes of its letters, is accepted 
+        starting from the given state."""
+        
+        if self.deterministic:
+            table = self.table
+            size = len(self.alphabet)
+            
+            q = state.index
+            for s in codes:
+                q = table[q * size + s]
+                if q < 0:
+                    return False
+                
+            return self.states[q] in self.acceptingStates
         
-        return self.recognizeWord(list(state.computeTransition(word[0]))[0], word[1:])
+        currStates: set[State] = self.computeEpsilonClosure({state})
+        for s in codes:
+            currStates = self.computeEpsilonClosure({self.states[q] for q in self.computeSetTransition(currStates, s)})
+            if len(currStates) == 0:
+                return False
+            
+        return not currStates.isdisjoint(self.acceptingStates)
+    
+    def recognizeBatch(self, words, lengths = None):
+        """Returns the acceptance of many words of a deterministic automaton, starting 
+        from the initial state. Each word is a sequence of codes of letters, words 
+        can also be a 2D integer array with a word for each row, whose lengths are 
+        given by lengths (by default all the rows are used entirely).
+        
+        If NumPy is available all the words are advanced together with vectorized 
+        lookups of the table and a boolean array is returned, otherwise a list of 
+        booleans is returned."""
+        
+        assert self.deterministic, print("Batch recognition requires a deterministic automaton")
+        
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+            
+        # lengths may be an array, so it is not compared with ==
+        if np == None or not (isinstance(words, np.ndarray) and words.ndim == 2):
+            words = list(words)
+            if lengths is not None:
+                words = [words[i][:lengths[i]] for i in range(len(words))]
+                
+        size = len(self.alphabet)
+        
+        if np == None:
+            assert all(0 <= s < size for w in words for s in w), print(f"The codes of the letters must be between 0 and {size - 1}")
+            return [self.recognizeCodes(self.initState, w) for w in words]
+        
+        n = self.statesNumber
+        
+        # Table extended with the dead state n, reached by the missing transitions,
+        # and the padding letter size, which does not change the state
+        table = np.frombuffer(self.table, dtype=np.int32).reshape(n, size)
+        extended = np.full((n + 1, size + 1), n, dtype=np.int64)
+        extended[:n, :size] = np.where(table >= 0, table, n)
+        extended[:, size] = np.arange(n + 1)
+        extended = extended.ravel()
+        
+        accepting = np.zeros(n + 1, dtype=bool)
+        accepting[[state.index for state in self.acceptingStates]] = True
+        
+        if isinstance(words, np.ndarray) and words.ndim == 2:
+            letters = words.astype(np.int64)
+            if lengths is None:
+                lengths = np.full(letters.shape[0], letters.shape[1])
+            lengths = np.asarray(lengths)
+        else:
+            lengths = np.array([len(w) for w in words], dtype=np.int64)
+            letters = np.full((len(words), max(lengths, default=0)), size, dtype=np.int64)
+            for i in range(len(words)):
+                letters[i, :len(words[i])] = words[i]
+                
+        # The positions after the end of each word are filled with the padding letter, 
+        # the other ones must contain the code of a letter
+        padding = np.arange(letters.shape[1]) >= lengths[:, None]
+        assert np.all(((letters >= 0) & (letters < size)) | padding), print(f"The codes of the letters must be between 0 and {size - 1}")
+        letters[padding] = size
+        
+        states = np.full(letters.shape[0], self.initState.index, dtype=np.int64)
+        for t in range(letters.shape[1]):
+            states = extended[states * (size + 1) + letters[:, t]]
+            
+        return accepting[states]
 
     def __str__(self) -> str:
         S: str = f"""Numero di stati: {self.statesNumber}
@@ -409,7 +968,7 @@ Stati accettanti: """
             
         S += "\nTransizioni: \n"
         for state in self.states:
-            S += state.transitionsToDot(self.atomicProps)
+            S += state.transitionsToDot(self.alphabet)
             
         return S
     
@@ -430,7 +989,7 @@ Stati accettanti: """
         
         for state in self.states:
             S += "\n\t" + str(state.index) + ";"
-            S += state.transitionsToDot(self.atomicProps)
+            S += state.transitionsToDot(self.alphabet)
         
         from datetime import datetime
         S +=  '\tlabelloc="t"; \n' + '\tlabel ="' + str(datetime.now()) + '";\n'
@@ -0,0 +1,134 @@
+from typing import Iterable, Iterator
+from FiniteAutomaton import FiniteAutomaton
+from CascadeDecomposition import CascadeDecomposition
+from Alphabet import Alphabet
+
+class Monitor:
+    def __init__(self, automaton: FiniteAutomaton | CascadeDecomposition) -> None:
+        """An incremental monitor of a stream of events, built from a deterministic
+        automaton or from a cascade decomposition. After each event the verdict is
+        True if the events read so far form an accepted word.
+
+        The current state is a single integer: the index of the state of the automaton
+        or the index of the configuration of the decomposition (-1 once a missing
+        transition is taken). The transitions of the configurations are computed layer
+        by layer the first time they are taken and then stored, so each event takes
+        constant time."""
+
+        self.decomposition: CascadeDecomposition | None = None
+
+        if isinstance(automaton, CascadeDecomposition):
+            self.decomposition = automaton
+            self.alphabet: Alphabet = automaton.dfa.alphabet
+
+            self.acceptingIndexes: set[int] = {state.index for state in automaton.dfaAcceptingStates}
+
+            # Configurations in order of discovery, configs[i] has index i
+            self.configs: list[tuple[int, ...]] = []
+            self.configIndex: dict[tuple[int, ...], int] = {}
+            self.accepting: list[bool] = []
+
+            # Computed transitions of the configurations,
+            # configTransitions[c * |alphabet| + s] is the target of c with the letter s
+            self.configTransitions: dict[int, int] = {}
+
+            initConfigurations = automaton.phiInv[automaton.dfaInitState.index]
+            assert len(initConfigurations) > 0, print("No configuration of the cascade is mapped to the initial state of the DFA")
+            
+            self.initState: int = self.addConfiguration(min(initConfigurations))
+        else:
+            assert automaton.deterministic, print("The monitor requires a deterministic automaton")
+
+            self.alphabet: Alphabet = automaton.alphabet
+            self.table = automaton.table
+
+            self.accepting: list[bool] = [False for _ in range(automaton.statesNumber)]
+            for state in automaton.acceptingStates:
+                self.accepting[state.index] = True
+
+            self.initState: int = automaton.initState.index
+
+        self.size: int = len(self.alphabet)
+        self.state: int = self.initState
+
+    def addConfiguration(self, config: tuple[int, ...]) -> int:
+        """Returns the index of a configuration of the decomposition, adding it if it is new."""
+
+        assert self.decomposition != None
+
+        c = self.configIndex.get(config)
+        if c == None:
+            c = len(self.configs)
+            self.configs.append(config)
+            self.configIndex[config] = c
+
+            dfaState = self.decomposition.phi.get(config)
+            self.accepting.append(dfaState != None and dfaState.index in self.acceptingIndexes)
+
+        return c
+
+    def configurationTransition(self, c: int, s: int) -> int:
+        """Returns the index of the target of the configuration c with the letter s."""
+
+        assert self.decomposition != None
+
+        target = self.configTransitions.get(c * self.size + s)
+        if target == None:
+            config = self.configs[c]
+            targetConfig = self.decomposition.computeConfigurationTransition(len(config) - 1, config, s)
+
+            target = self.addConfiguration(targetConfig) if targetConfig != None else -1
+            self.configTransitions[c * self.size + s] = target
+
+        return target
+
+    @property
+    def verdict(self) -> bool:
+        """True if the events read so far form an accepted word."""
+
+        return self.state >= 0 and self.accepting[self.state]
+
+    def stepCode(self, s: int) -> bool:
+        """Reads an event given as the code of a letter and returns the new verdict."""
+
+        q = self.state
+        if q >= 0:
+            if self.decomposition == None:
+                q = self.table[q * self.size + s]
+            else:
+                q = self.configurationTransition(q, s)
+            self.state = q
+
+        return q >= 0 and self.accepting[q]
+
+    def step(self, letter: Iterable[str]) -> bool:
+        """Reads an event given as the set of true propositions and returns the new verdict."""
+
+        return self.stepCode(self.alphabet.encode(letter))
+
+    def stepMany(self, letters: Iterable[Iterable[str]]) -> bool:
+        """Reads many events and returns the verdict after the last one."""
+
+        for letter in letters:
+            self.stepCode(self.alphabet.encode(letter))
+
+        return self.verdict
+
+    def verdicts(self, letters: Iterable[Iterable[str]]) -> Iterator[bool]:
+        """Reads the events lazily, yielding the verdict after each one."""
+
+        for letter in letters:
+            yield self.stepCode(self.alphabet.encode(letter))
+
+    def snapshot(self) -> int:
+        """Returns the current state, which can be given to restore."""
+
+        return self.state
+
+    def restore(self, snapshot: int) -> None:
+        self.state = snapshot
+
+    def reset(self) -> None:
+        """Goes back to the state before the first event."""
+
+        self.state = self.initState
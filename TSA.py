@@ -1,38 +1,54 @@
-from FiniteAutomaton import FiniteAutomaton, State
-from itertools import combinations, chain
+from collections import deque
+from typing import Iterator
+from FiniteAutomaton import FiniteAutomaton, State, memoryReport
+from Alphabet import Alphabet
 
-class TSATransition:
-    def __init__(self, target: "TSANode", propAt: set[str]) -> None:
-        self.target = target
-        self.ap = propAt
-        
-    def evaluate(self, atProps: set[str]) -> bool:
-        """Return True if atProps satisfies the transition formula, False otherwise."""
-        
-        return self.ap == atProps
-        
-    def __str__(self) -> str:
-        return f"{self.ap} -> {self.target.index}"   
-    
 class TSANode:
     """Contains nodes used in TSA. It has a parenthood 
     function, a transition function and a map to
-    subsets of states of the FA."""
+    subsets of states of the FA.
     
-    def __init__(self, index: int, states: set[int]) -> None:
+    The subset of states is stored as a bitmask, the 
+    i-th bit is set if the i-th state belongs to it. The 
+    transitions are stored in a dictionary indexed by the 
+    code of the letter."""
+    
+    __slots__ = ("index", "parent", "children", "targets", "mask", "equivClass", "tarjanIdx", "height", 
+                 "pre", "post", "labelEnd", "rank")
+    
+    def __init__(self, index: int, mask: int) -> None:
         self.index = index
         
         self.parent: TSANode | None = None # if < 0, then it is the root
         self.children: set[int] = set()
         
-        self.trans: list[TSATransition] = []
-        self.states: set[int] = states #Subset of states of the FA
+        # targets[s] is the target with the letter s. The order of the 
+        # transitions is the order in which they were added, a replaced 
+        # transition is moved to the end, and the traversals depend on it
+        self.targets: dict[int, TSANode] = {}
+        self.mask: int = mask #Subset of states of the FA
         
         self.equivClass = -1
         self.tarjanIdx = -1
         self.height = -1
         
-        self._CAvisited = False
+        # Interval labels in the tree, see TSA.isAncestor
+        self.pre = -1
+        self.post = -1
+        self.labelEnd = -1
+        self.rank = 0
+        
+    @property
+    def states(self) -> set[int]:
+        """The indexes of the states in the subset."""
+        
+        return {q for q in range(self.mask.bit_length()) if (self.mask >> q) & 1}
+    
+    def containsState(self, q: int) -> bool:
+        return (self.mask >> q) & 1 == 1
+    
+    def isSingleton(self) -> bool:
+        return self.mask & (self.mask - 1) == 0
         
     def addParent(self, newParent: "TSANode"):
         if self.parent != None:
@@ -41,52 +57,74 @@ class TSANode:
         self.parent = newParent
         newParent.children.add(self.index)
         
-    def addTransition(self, target: "TSANode", prop_int: set[str]):
-        for t in self.trans:
-            if t.ap == prop_int:
-                self.trans.remove(t)
-                break
+    def addTransition(self, target: "TSANode", letter: int):
+        if letter in self.targets:
+            del self.targets[letter]
             
-        self.trans.append(TSATransition(target, prop_int))
+        self.targets[letter] = target
         
-    def computeTransition(self, atProp: set[str]) -> "TSANode":
-        res = None
-        for t in self.trans:
-            if t.evaluate(atProp):
-                res = t.target
-                break
-            
+    def computeTransition(self, letter: int) -> "TSANode":
+        res = self.targets.get(letter)
         assert res != None 
         
         return res
     
-    # Parameter m might be redundant
-    def computeWord(self, m: "TSANode", word: list[set[str]]) -> "TSANode":
-        if len(word) == 0:
-            return m
+    def transitions(self) -> list[tuple[int, "TSANode"]]:
+        """Returns the letters and the targets of the transitions."""
         
-        next = m.computeTransition(word[0])
-        assert next != None
-        
-        return self.computeWord(next, word[1:])
+        return list(self.targets.items())
+    
+    # Parameter m might be redundant
+    def computeWord(self, m: "TSANode", word: list[int]) -> "TSANode":
+        for letter in word:
+            m = m.computeTransition(letter)
+            
+        return m
     
     def __str__(self) -> str:
         S = f"{self.index}|{self.states}) pi: {self.parent.index if self.parent != None else 'None'}, phi: {self.states}, h: {self.height}, delta: ["
-        for t in self.trans:
-            S += str(t) + ", "           
+        for (s, target) in self.transitions():
+            S += f"{s} -> {target.index}, "
         
         return S + " ]"
         
 class TSA:
     """Tree Subset Automaton"""
     
+    # Distance between consecutive interval labels after a relabelling
+    LABEL_SPACING = 1 << 32
+    
     def __init__(self, DFA: FiniteAutomaton) -> None:
         """Generates a TSA starting from a determinized automaton."""
         
         self.nodes: list[TSANode] = []
+        
+        # Nodes carrying each subset of states (as a bitmask), in order of creation
+        self.subsetIndex: dict[int, list[TSANode]] = {}
+        
+        # Images of the states, see computeSuccessors
+        self.successors: list[list[int]] = []
+        
+        # True if the interval labels of the nodes describe the current tree, 
+        # walkQueries counts the ancestor queries answered without them
+        self.labelsValid = False
+        self.walkQueries = 0
+        
+        # jumps[k][i] is the index of the 2^k-th ancestor of the i-th node (-1 if there
+        # is none) and jumpMinHeight[k][i] is the minimum height of its first 2^k ancestors,
+        # they are computed when the tree is complete
+        self.jumps: list[list[int]] = []
+        self.jumpMinHeight: list[list[int]] = []
+        
+        # Words from the nodes of an equivalence class to a node of the class, 
+        # indexed by the index of the end node, see equivalenceWord
+        self.predecessors: list[list[int]] = []
+        self.classWords: dict[int, dict[int, list[int] | None]] = {}
+        
         self.height = -1
         self.heightClasses: list[list[TSANode]] = []
         self.atomicProps: set[str] = DFA.atomicProps
+        self.alphabet: Alphabet = DFA.alphabet
         self.dfaAcceptingstates = DFA.acceptingStates
         self.dfaInitstate = DFA.initState
         
@@ -111,125 +149,115 @@ class TSA:
     def fromDfa(self, DFA: FiniteAutomaton) -> None:
         """Build the corrseponding TSA of the given DFA."""
         
-        root = self.addNewNode(set(range(DFA.statesNumber)))
+        self.computeSuccessors(DFA)
         
-        L: list[TSANode] = [root]
+        root = self.addNewNode((1 << DFA.statesNumber) - 1)
+        
+        L: deque[TSANode] = deque([root])
         
         while len(L) > 0:
-            alphabet_it = chain.from_iterable(combinations(self.atomicProps, r) for r in range(len(self.atomicProps)+1))
-            m = L[0]
+            m = L.popleft()
             
-            for s in alphabet_it: 
-                rSet = set()
-                for stateIdx in m.states:
-                    rSet.add(DFA.states[stateIdx])
-                    
-                F: set[int] = DFA.computeSetTransition(rSet, list(s))
+            for s in self.alphabet: 
+                F: int = self.image(m.mask, s)
                 
                 m_1: TSANode | None = None
                 
                 if m.parent == None:
-                    for node in self.nodes:
-                        if node.states == F:
-                            m_1 = node
-                            break    
+                    nodes = self.subsetIndex.get(F)
+                    if nodes != None:
+                        m_1 = nodes[0]
                 
                     if m_1 == None:
                         m_1 = self.addNewNode(F)
-                        m_1.addParent(m)
+                        self.insertNode(m_1, m, [])
                         
                         L.append(m_1)
                 else:
-                    parentTarget = m.parent.computeTransition(set(s))
+                    parentTarget = m.parent.computeTransition(s)
                     
-                    for node in self.nodes:
-                        ancestors = self.getAncestors(node)
-                        
-                        if node.states == F and parentTarget in ancestors:
-                            m_1 = node
-                            break  
+                    m_1 = self.findNode(F, parentTarget)
                         
                     if m_1 == None:
                         m_1 = self.addNewNode(F)
                         
                         L.append(m_1)
                         
-                        r = self.deepestDescendentContainingSubset(m.parent.computeTransition(set(s)), F)
-                        
-                        for idx in r.children.copy():
-                            r_1 = self.nodes[idx]
-                            if r_1.states.issubset(F):
-                                r_1.addParent(m_1)
+                        r = self.deepestDescendentContainingSubset(m.parent.computeTransition(s), F)
                         
-                        m_1.addParent(r)
+                        self.insertNode(m_1, r, [self.nodes[idx] for idx in r.children if self.nodes[idx].mask & ~F == 0])
                         
-                m.addTransition(m_1, set(s))
-                    
-            L.remove(m)
+                m.addTransition(m_1, s)
             
         self.addSingleton(root, DFA)
         
     def addSingleton(self, r: TSANode, dfa: FiniteAutomaton):
-        if len(r.states) == 1:
-            return
+        """Adds the singletons below r and below all its descendants, visiting 
+        the tree in preorder."""
+        
+        # Iterators over the children still to be visited at each level
+        S = [iter([r.index])]
+        while len(S) > 0:
+            idx = next(S[-1], None)
+            
+            if idx == None:
+                S.pop()
+                continue
+            
+            n = self.nodes[idx]
+            if not n.isSingleton():
+                self.addNodeSingletons(n, dfa)
+                S.append(iter(n.children))
+        
+    def addNodeSingletons(self, r: TSANode, dfa: FiniteAutomaton):
+        """Adds a singleton child to r for each state not covered by its children, 
+        with all the nodes reached from them."""
         
-        childrenStates: set[int] = set()
+        childrenStates = 0
         for child in r.children:
-            childrenStates = childrenStates.union(self.nodes[child].states)
+            childrenStates |= self.nodes[child].mask
 
 
         L: list[TSANode] = []
         
-        for q in r.states.difference(childrenStates):
-            m: TSANode = self.addNewNode({q})
-            m.addParent(r)
-            L.append(m)
+        uncovered = r.mask & ~childrenStates
+        for q in range(uncovered.bit_length()):
+            if (uncovered >> q) & 1:
+                m: TSANode = self.addNewNode(1 << q)
+                self.insertNode(m, r, [])
+                L.append(m)
         
 
         while len(L) > 0:
             m = L.pop()
             assert m.parent != None
                         
-            alphabet_it = chain.from_iterable(combinations(self.atomicProps, r) for r in range(len(self.atomicProps)+1))
-            for s in alphabet_it: 
-                rSet = set()
-                for stateIdx in m.states:
-                    rSet.add(dfa.states[stateIdx])
-                    
-                F: set[int] = dfa.computeSetTransition(rSet, list(s))
+            for s in self.alphabet: 
+                F: int = self.image(m.mask, s)
                 
-                m_1: TSANode | None = None
-                
-                parentTarget = m.parent.computeTransition(set(s))
-                    
-                for node in self.nodes:
-                    ancestors = self.getAncestors(node)
+                parentTarget = m.parent.computeTransition(s)
                     
-                    if node.states == F and parentTarget in ancestors:
-                        m_1 = node
-                        break  
+                m_1: TSANode | None = self.findNode(F, parentTarget)
                         
                 if m_1 == None:
                     m_1 = self.addNewNode(F)
                     
-                    n = self.deepestDescendentContainingSubset(m.parent.computeTransition(set(s)), F)
+                    n = self.deepestDescendentContainingSubset(m.parent.computeTransition(s), F)
                     
-                    for idx in n.children.copy():
-                        r_1 = self.nodes[idx]
-                        if r_1.states.issubset(F):
-                            r_1.addParent(m_1)
-                    
-                    m_1.addParent(n)
+                    self.insertNode(m_1, n, [self.nodes[idx] for idx in n.children if self.nodes[idx].mask & ~F == 0])
                     
                     L.append(m_1)
                         
-                m.addTransition(m_1, set(s))
-                    
-        for childIdx in r.children:
-            self.addSingleton(self.nodes[childIdx], dfa)
+                m.addTransition(m_1, s)
 
     def computeHeight(self) -> None:
-        """Computes the height for each node in the TSA."""
+        """Computes the height for each node in the TSA.
+        
+        The singletons have height 0, any other node is one higher than the highest 
+        of its successors, i.e. its children and the targets of its transitions, 
+        outside its equivalence class (1 if there are none). The heights are the 
+        longest paths in the graph of these edges, which are computed visiting 
+        each node once all its successors have a height."""
         
         self.S: list[TSANode] = []
         self.tarjanIdx = 0
@@ -238,50 +266,60 @@ class TSA:
         for v in self.nodes:
             if (v.tarjanIdx < 0):
                 self.tarjanEquiv(v) 
- 
-        visited: list[bool] = [False for _ in range(len(self.nodes))]
+                
+        n = len(self.nodes)
+        
+        # preds[i] are the nodes having the i-th node as a successor, remaining[i] 
+        # is the number of successors of the i-th node without a height 
+        preds: list[list[int]] = [[] for _ in range(n)]
+        remaining: list[int] = [0] * n
         
-        self.heightClasses.append([])
         for m in self.nodes:
-            if len(m.states) == 1:
-                self.heightClasses[0].append(m)
-                visited[m.index] = True
-                m.height = 0
+            if m.isSingleton():
+                continue
+            
+            successors = set(m.children)
+            for (_, target) in m.transitions():
+                successors.add(target.index)
                 
-        self.height = 1
+            for idx in successors:
+                if self.nodes[idx].equivClass != m.equivClass:
+                    preds[idx].append(m.index)
+                    remaining[m.index] += 1
+                    
+        heights: list[int] = [-1] * n
+        
+        # maxHeight[i] is the highest height among the successors of the i-th node
+        maxHeight: list[int] = [0] * n
         
-        while not (len(self.heightClasses[self.height - 1]) == 1 and self.heightClasses[self.height - 1][0] == self.nodes[0]):
-            self.heightClasses.append([])
+        Q: deque[int] = deque(i for i in range(n) if remaining[i] == 0)
+        while len(Q) > 0:
+            i = Q.popleft()
+            heights[i] = 0 if self.nodes[i].isSingleton() else maxHeight[i] + 1
             
-            for n in self.nodes:
-                if not visited[n.index]:
-                    self.heightClasses[self.height].append(n)
-                    
-            updated = True
-            while updated:
-                updated = False
+            for p in preds[i]:
+                maxHeight[p] = max(maxHeight[p], heights[i])
+                remaining[p] -= 1
                 
-                for m in self.heightClasses[self.height]:
-                    for m_1 in self.nodes:
-                        canReach = False
-
-                        for t in m.trans:
-                            if t.target == m_1:
-                                canReach = True
-                                break
-                            
-                        if not visited[m_1.index] and m.equivClass != m_1.equivClass and (m_1.parent == m or canReach):
-                            self.heightClasses[self.height].remove(m)
-                            updated = True
-                            break
-                        
-                    if updated: break
+                if remaining[p] == 0:
+                    Q.append(p)
+                    
+        root = self.nodes[0]
+        assert heights[0] >= 0, print("The successors of the nodes are cyclic")
         
-            for m in self.heightClasses[self.height]:
-                visited[m.index] = True
-                m.height = self.height
-
-            self.height += 1
+        # The root is the only node in the last height class, higher 
+        # nodes are not descendants of the root and have no height
+        self.height = heights[0] + 1
+        self.heightClasses = [[] for _ in range(self.height)]
+        
+        for m in self.nodes:
+            if heights[m.index] < self.height:
+                m.height = heights[m.index]
+                
+                if m.height >= 0:
+                    self.heightClasses[m.height].append(m)
+                    
+        assert self.heightClasses[self.height - 1] == [root], print("The root is not the only node with the highest height")
                         
         # self.computeHeightRec(self.nodes[0])
         # self.height = self.nodes[0].height
@@ -296,14 +334,13 @@ class TSA:
         """Helper function for computing the height."""
         v.height = 0
 
-        if len(v.states) == 1:
+        if v.isSingleton():
             return
         
         maxHeight = 0
         
-        for t in v.trans:
+        for (_, m) in v.transitions():
             currHeight = 0 
-            m = t.target
             if m.height < 0:
                 self.computeHeightRec(m)
             
@@ -330,30 +367,48 @@ class TSA:
         """Uses Tarjan's algorithm to search the SCC. Each SCC represents an equivalence 
         class of the nodes."""
         
-        v.tarjanIdx = self.tarjanIdx
-        v.equivClass = self.tarjanIdx
-        self.tarjanIdx += 1
-        self.S.append(v)
-        self.inStack[v.index] = True
+        self.tarjanVisit(v)
         
-        for t in v.trans:
-            m = t.target
-            if m == v:
-                continue
+        # Nodes being visited, with the iterator over their transitions
+        work: list[tuple[TSANode, Iterator[TSANode]]] = [(v, iter(v.targets.values()))]
+        
+        while len(work) > 0:
+            (u, it) = work[-1]
             
-            if (m.tarjanIdx < 0):
-                self.tarjanEquiv(m)
-                v.equivClass = min(v.equivClass, m.equivClass)
-            elif (self.inStack[m.index]):
-                v.equivClass = min(v.equivClass, m.equivClass)
+            m = next(it, None)
+            if m != None:
+                if m == u:
+                    continue
                 
-        if v.equivClass == v.tarjanIdx:
-            w = self.S.pop()
-            self.inStack[w.index] = False
+                if (m.tarjanIdx < 0):
+                    self.tarjanVisit(m)
+                    work.append((m, iter(m.targets.values())))
+                elif (self.inStack[m.index]):
+                    u.equivClass = min(u.equivClass, m.equivClass)
+                    
+                continue
             
-            while (w.tarjanIdx != v.tarjanIdx):
+            work.pop()
+                
+            if u.equivClass == u.tarjanIdx:
                 w = self.S.pop()
                 self.inStack[w.index] = False
+                
+                while (w.tarjanIdx != u.tarjanIdx):
+                    w = self.S.pop()
+                    self.inStack[w.index] = False
+                    
+            # Back to the node which reached u
+            if len(work) > 0:
+                p = work[-1][0]
+                p.equivClass = min(p.equivClass, u.equivClass)
+                
+    def tarjanVisit(self, v: TSANode) -> None:
+        v.tarjanIdx = self.tarjanIdx
+        v.equivClass = self.tarjanIdx
+        self.tarjanIdx += 1
+        self.S.append(v)
+        self.inStack[v.index] = True
             
     def balance(self) -> None:
         """Balances the TSA."""
@@ -366,38 +421,36 @@ class TSA:
                 assert p != None
             
                 if p.height != r.height + 1:
-                    m = self.addNewNode(r.states)
-                    m.addParent(p)
-                    m.trans = r.trans.copy()
+                    m = self.addNewNode(r.mask)
+                    self.insertNode(m, p, [r])
+                    m.targets = r.targets.copy()
                     m.height = r.height + 1
                     m.equivClass = r.equivClass
                     self.heightClasses[m.height].append(m)
-                    r.addParent(m)
                     
     def liftTransitions(self) -> None:
         """Remove the transition between layers, lifting them to the appropiate level."""
         
+        self.computeJumps()
+        
         for height in range(self.height):
             M = self.heightClasses[height]
             
             for m in M:
-                newTransitions: list[tuple[TSANode, set[str]]] = []
+                newTransitions: list[tuple[TSANode, int]] = []
                 
-                for t in m.trans:
-                    m_1 = t.target
+                for (s, m_1) in m.transitions():
                     
                     if m_1.height != m.height:
                         assert m_1.parent != None, print("m:", m.states, ", m_1:", m_1.states)
-                        anc = m_1.parent
                         
-                        while anc.height > m.height:
-                            assert anc.parent != None, print(anc.states)
-                            anc = anc.parent
+                        anc = self.ancestorAtHeight(m_1.parent, m.height)
+                        assert anc != None, print(m_1.states)
 
-                        newTransitions.append((anc, t.ap))
+                        newTransitions.append((anc, s))
 
-                for (anc, ap) in newTransitions:
-                    m.addTransition(anc, ap)
+                for (anc, letter) in newTransitions:
+                    m.addTransition(anc, letter)
                     
     def getDescendants(self, m: TSANode) -> set[int]:
         """Returns the inedxes of all the descendants of a node."""
@@ -414,43 +467,282 @@ class TSA:
                 
         return desc
     
-    def computeWordTo(self, start: TSANode, end: TSANode, visited: list[bool], word: list[set[str]]) -> list[set[str]] | None:
-        """Returns the word to transition from the start node to the target node."""
+    def equivalenceWord(self, start: TSANode, end: TSANode) -> list[int] | None:
+        """Returns the word to transition from the start node to the end node of its 
+        equivalence class.
+        
+        The words to end from all the nodes of the class are computed together by 
+        computeClassWords on the first call with end, the next calls for the other 
+        nodes of the class (one for each node, see assignTheta) and for the 
+        decompositions built on the TSA read them."""
+        
+        words = self.classWords.get(end.index)
+        if words == None:
+            words = self.computeClassWords(end)
+            self.classWords[end.index] = words
+            
+        return words.get(start.index)
+    
+    def computeClassWords(self, end: TSANode) -> dict[int, list[int] | None]:
+        """Returns the words to transition from each node in the equivalence class 
+        of end to end, indexed by the index of the start node.
+        
+        The word of a start node is the first path to end of a depth first visit 
+        from it, following the transitions in order. The visits skip the nodes which 
+        cannot reach end, whose subtrees never contain end. The words of different 
+        start nodes are not suffixes of one another, so each node has its own visit."""
+        
+        reaching = self.computeReachingNodes(end)
+        
+        words: dict[int, list[int] | None] = {}
+        
+        for start in self.nodes:
+            if start.equivClass != end.equivClass:
+                continue
+            
+            word: list[int] | None = None
+            
+            if start == end:
+                word = []
+            elif start.index in reaching:
+                visited: set[int] = {start.index}
+                
+                # Depth first visit, path contains the letters from start 
+                # to the last node in S
+                path: list[int] = []
+                S: list[Iterator[tuple[int, TSANode]]] = [iter(start.targets.items())]
+                
+                while len(S) > 0 and word == None:
+                    step = next(S[-1], None)
+                    
+                    if step != None:
+                        (s, target) = step
+                        
+                        if target.index in reaching and not (target.index in visited):
+                            if target == end:
+                                word = path + [s]
+                            else:
+                                visited.add(target.index)
+                                S.append(iter(target.targets.items()))
+                                path.append(s)
+                    else:
+                        S.pop()
+                        if len(path) > 0:
+                            path.pop()
+                            
+            words[start.index] = word
+            
+        return words
+    
+    def computeReachingNodes(self, end: TSANode) -> set[int]:
+        """Returns the indexes of the nodes from which end can be reached."""
+        
+        if len(self.predecessors) == 0:
+            # Assigned only when complete, another thread may be reading it
+            predecessors: list[list[int]] = [[] for _ in range(len(self.nodes))]
+            for n in self.nodes:
+                for (_, target) in n.transitions():
+                    predecessors[target.index].append(n.index)
+                    
+            self.predecessors = predecessors
+            
+        reaching: set[int] = {end.index}
+        
+        Q: deque[int] = deque([end.index])
+        while len(Q) > 0:
+            for p in self.predecessors[Q.popleft()]:
+                if not (p in reaching):
+                    reaching.add(p)
+                    Q.append(p)
+                    
+        return reaching
+    
+    def computeSuccessors(self, DFA: FiniteAutomaton) -> None:
+        """Computes the tables of the images of the states, successors[s][q] is 
+        the bitmask of the states reached from the state q with the letter s."""
+        
+        n = DFA.statesNumber
+        
+        self.successors = []
+        for s in self.alphabet:
+            single: list[int] = []
+            for q in range(n):
+                image = 0
+                for t in DFA.computeSetTransition({DFA.states[q]}, s):
+                    image |= 1 << t
+                single.append(image)
+                
+            self.successors.append(single)
+            
+    def image(self, mask: int, s: int) -> int:
+        """Returns the bitmask of the states reached from the subset with the letter s, 
+        the union of the images of the states in the subset."""
         
-        if start == end:
-            return word
+        single = self.successors[s]
         
-        visited[start.index] = True
+        res = 0
+        while mask != 0:
+            low = mask & -mask
+            res |= single[low.bit_length() - 1]
+            mask ^= low
+            
+        return res
+    
+    def findNode(self, mask: int, ancestor: TSANode) -> TSANode | None:
+        """Returns the first created node with the given subset of states which is a 
+        descendant of ancestor (or ancestor itself), None if there is no such node."""
         
-        for t in start.trans:
-            newWord = word.copy()
-            newWord.append(t.ap)
+        for node in self.subsetIndex.get(mask, []):
+            if self.isAncestor(ancestor, node):
+                return node
             
-            if not visited[t.target.index]:
-                res = self.computeWordTo(t.target, end, visited, newWord)
+        return None
+    
+    def isAncestor(self, a: TSANode, m: TSANode) -> bool:
+        """Returns True if a is an ancestor of m, each node is an ancestor of itself.
+        
+        Each node has an interval [pre, post] containing the intervals of its 
+        descendants, so the query takes constant time. The nodes inserted above a 
+        single child get the interval of the child, and among the nodes with the 
+        same interval the ancestors have a smaller rank. If the labels are not 
+        valid the parents of m are visited instead, the labels are recomputed 
+        once there have been as many of these queries as nodes."""
+        
+        if not self.labelsValid:
+            self.walkQueries += 1
+            if self.walkQueries > len(self.nodes):
+                self.relabel()
                 
-                if res != None:
-                    return res
+        if self.labelsValid:
+            if a.pre == m.pre and a.post == m.post:
+                return a.rank <= m.rank
+            
+            return a.pre < m.pre and m.post < a.post
+        
+        n: TSANode | None = m
+        while n != None:
+            if n == a:
+                return True
+            n = n.parent
+            
+        return False
     
-    def getAncestors(self, m: TSANode) -> set[TSANode]:
-        """Returns the inedxes of all the ancestors of a node."""
+    def relabel(self) -> None:
+        """Computes the interval labels of all the nodes with a depth first visit 
+        of the tree. Consecutive labels are LABEL_SPACING apart, leaving room for 
+        the nodes added later."""
         
-        anc: set[TSANode] = set()
-        S: list[TSANode] = [m]
+        label = 0
         
+        # The second element is True when the node is exited
+        S: list[tuple[TSANode, bool]] = [(self.nodes[0], False)]
         while len(S) > 0:
-            n = S.pop()
+            (n, exiting) = S.pop()
+            label += TSA.LABEL_SPACING
             
-            if not (n in anc):
-                anc.add(n)
-                parent = n.parent
+            if exiting:
+                n.post = label
+            else:
+                n.pre = label
+                n.labelEnd = label
+                n.rank = 0
                 
-                if parent != None:
-                    S.append(parent)
+                S.append((n, True))
+                for idx in n.children:
+                    S.append((self.nodes[idx], False))
+            
+            # The last label used inside the parent is the post of its last child
+            if exiting and n.parent != None:
+                n.parent.labelEnd = max(n.parent.labelEnd, n.post)
+                    
+        self.labelsValid = True
+        self.walkQueries = 0
+    
+    def insertNode(self, m: TSANode, parent: TSANode, children: list[TSANode]) -> None:
+        """Makes the new node m a child of parent and the parent of the given children 
+        of parent, updating the interval labels when there is room for m."""
+        
+        for c in children:
+            c.addParent(m)
+        m.addParent(parent)
+        
+        if not self.labelsValid:
+            return
+        
+        if len(children) == 0:
+            # A leaf takes half of the free labels after the last child of the parent
+            room = parent.post - parent.labelEnd - 1
+            if room >= 2:
+                m.pre = parent.labelEnd + 1
+                m.post = m.pre + room // 2
+                m.labelEnd = m.pre
+                m.rank = 0
+                parent.labelEnd = m.post
+                return
+            
+        elif len(children) == 1:
+            # A node inserted above a single child has the same interval of the child
+            c = children[0]
+            
+            low = parent.rank if parent.pre == c.pre and parent.post == c.post else c.rank - TSA.LABEL_SPACING
+            if c.rank - low >= 2:
+                m.pre = c.pre
+                m.post = c.post
+                m.labelEnd = c.post
+                m.rank = (low + c.rank) // 2
+                return
+            
+        self.labelsValid = False
+        self.walkQueries = 0
+        
+    def computeJumps(self) -> None:
+        """Computes the ancestors of the nodes at the powers of two, used by ancestorAtHeight.
+        The tree must not change afterwards."""
+        
+        n = len(self.nodes)
+        
+        self.jumps = [[m.parent.index if m.parent != None else -1 for m in self.nodes]]
+        self.jumpMinHeight = [[m.parent.height if m.parent != None else -1 for m in self.nodes]]
+        
+        k = 0
+        while (1 << k) < n:
+            jump = self.jumps[k]
+            minHeight = self.jumpMinHeight[k]
+            
+            newJump: list[int] = []
+            newMinHeight: list[int] = []
+            for i in range(n):
+                j = jump[i]
+                if j < 0 or jump[j] < 0:
+                    newJump.append(-1)
+                    newMinHeight.append(-1)
+                else:
+                    newJump.append(jump[j])
+                    newMinHeight.append(min(minHeight[i], minHeight[j]))
+                    
+            self.jumps.append(newJump)
+            self.jumpMinHeight.append(newMinHeight)
+            k += 1
+            
+    def ancestorAtHeight(self, m: TSANode, height: int) -> TSANode | None:
+        """Returns the first node with at most the given height among m and its ancestors, 
+        None if there is no such node."""
+        
+        if m.height <= height:
+            return m
+        
+        # Climb while all the nodes skipped by the jump are higher than height, 
+        # the answer is then the parent of the reached node
+        i = m.index
+        for k in reversed(range(len(self.jumps))):
+            if self.jumps[k][i] >= 0 and self.jumpMinHeight[k][i] > height:
+                i = self.jumps[k][i]
                 
-        return anc
+        parent = self.nodes[i].parent
+        
+        return parent if parent != None and parent.height <= height else None
     
-    def deepestDescendentContainingSubset(self, m: TSANode, F: set[int]) -> TSANode:
+    def deepestDescendentContainingSubset(self, m: TSANode, F: int) -> TSANode:
         deepest = (m, 0)
         
         S = [(m, 0)]
@@ -459,7 +751,7 @@ class TSA:
             
             for child in n[0].children:
                 newDesc = (self.nodes[child], n[1] + 1)
-                if (newDesc[0].states.issubset(F)):
+                if newDesc[0].mask & ~F == 0:
                     S.append(newDesc)
                     
                     if newDesc[1] > deepest[1]:
@@ -467,7 +759,7 @@ class TSA:
                     
         return deepest[0]
         
-    def minimalDescendentStateSuperset(self, ancestor: TSANode, subset: set[int]) -> TSANode:
+    def minimalDescendentStateSuperset(self, ancestor: TSANode, subset: int) -> TSANode:
         """Find the minimal node, descendent of 'ancestor', with the smallest states 
         set associated such that it contains 'subset'. (Complexity ???)"""
         
@@ -477,13 +769,13 @@ class TSA:
         for idx in self.getDescendants(ancestor):
             m = self.nodes[idx]
                 
-            if (m.states.issuperset(subset)) and len(m.states) < len(res.states):
+            if subset & ~m.mask == 0 and m.mask.bit_count() < res.mask.bit_count():
                 res = m
         
         return res
     
     def isomorphicAutomaton(self) -> FiniteAutomaton:
-        fa = FiniteAutomaton(len(self.heightClasses[self.height - 1]), self.atomicProps)
+        fa = FiniteAutomaton(len(self.heightClasses[self.height - 1]), alphabet=self.alphabet)
         
         nodesToStates: dict[int, int] = {}
         
@@ -494,10 +786,8 @@ class TSA:
             
         for m in self.heightClasses[self.height - 1]:
 
-            for t in m.trans:
-                targetIdx = t.target.index
-                
-                fa.addTransition(fa.states[nodesToStates[m.index]], fa.states[nodesToStates[targetIdx]], t.ap)
+            for (s, target) in m.transitions():
+                fa.addTransition(fa.states[nodesToStates[m.index]], fa.states[nodesToStates[target.index]], s)
 
         for q in self.dfaAcceptingstates:
             fa.acceptingStates.append(fa.states[q.index])
@@ -506,13 +796,25 @@ class TSA:
         # print(fa)
         return fa
 
-    def addNewNode(self, states: set[int]) -> TSANode:
+    def addNewNode(self, mask: int) -> TSANode:
         """Creates a new node, appends it to the list of nodes and return the newly created state."""
-        newNode = TSANode(len(self.nodes), states)
+        newNode = TSANode(len(self.nodes), mask)
         self.nodes.append(newNode)
         
+        if mask in self.subsetIndex:
+            self.subsetIndex[mask].append(newNode)
+        else:
+            self.subsetIndex[mask] = [newNode]
+        
         return newNode
     
+    def memoryReport(self, seen: set[int] | None = None) -> dict[str, int]:
+        """Returns the bytes used by each component of the TSA (nodes, successors, 
+        jump tables, ...) and their total in "total". The states of the DFA are 
+        counted, the DFA itself is not."""
+        
+        return memoryReport(self, seen)
+        
     def __str__(self) -> str:
         S = ""
         for m in self.nodes:
@@ -534,8 +836,8 @@ class TSA:
             S += f"\n\t{n.index} [label=\"{n.states} {n.equivClass}\"]"
             # S += f"\n\t{n.index} [label=\"{n.states}\"]"
             
-            for t in n.trans:
-                S += f"\n\t{n.index} -> {t.target.index} [label=\"{t.ap}\"];"
+            for (s, target) in n.transitions():
+                S += f"\n\t{n.index} -> {target.index} [label=\"{self.alphabet.letterToStr(s)}\"];"
     
         for idx in range(1, len(self.nodes)):
             n = self.nodes[idx]
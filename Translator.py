@@ -13,7 +13,7 @@ class Translator:
         pass
     
     def ltlToPltl(self, ltlFormula: str) -> PLTLFormula:
-        dfa = FiniteAutomaton(formulaStr=ltlFormula).removeUnreachableStates()
+        dfa = FiniteAutomaton(formulaStr=ltlFormula).removeUnreachableStates().compressAlphabet()
         dfa.visualize("ltlToPltlDfa", "imgs/trn/")
     
         CD = CascadeDecomposition(dfa)
@@ -24,6 +24,8 @@ class Translator:
         
         CD.visualize("CD", "imgs/trn/")
         
+        CD.visualizeWithTsa("withTSA", "imgs/trn/")
+        
         CD.homomorphicAutomaton().visualize("CDisoFA", "imgs/trn/")  
         # CD.homomorphicAutomatonPhi().visualize("CDisoFA2", "imgs/trn/")  
         # print(CD.homomorphicAutomatonPhi())
@@ -48,7 +50,7 @@ class Translator:
         
         print("Switched:", self.convertLtlToString(switched))
         
-        switchedDfa = FiniteAutomaton(formulaStr=self.convertLtlToString(switched))
+        switchedDfa = FiniteAutomaton(formulaStr=self.convertLtlToString(switched)).compressAlphabet()
         switchedDfa.visualize("switchedDfa", "imgs/trn/")
         
         reversedNfa = switchedDfa.reverseTransitions(True)
@@ -87,6 +89,8 @@ class Translator:
         
         cascadeDecomposition.visualize("CD_Translator", "imgs/trn/")
         
+        cascadeDecomposition.visualizeWithTsa("withTSA", "imgs/trn/")
+        
         cascadeDecomposition.homomorphicAutomaton().visualize("CDisoFA", "imgs/trn/")    
 
         pltlSwitched = cascadeDecomposition.synthetizeFormula()